@@ -0,0 +1,88 @@
+"""iperf-style echo benchmark: bulk MB/s and small-message p99 latency
+
+   each server mode runs in its own process (stdout discarded); a sender
+   thread streams data while the main thread reads the echo back.
+
+   usage: python bench_echo.py [megabytes]
+"""
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+import main
+
+
+PORT = 12399
+
+
+def serve(mode):
+    sys.stdout = open(os.devnull, "w")
+    asyncio.run(main.main(PORT, mode))
+
+
+def connect():
+    for _ in range(50):
+        try:
+            return socket.create_connection(("127.0.0.1", PORT))
+        except ConnectionRefusedError:
+            time.sleep(0.1)
+    raise Exception("server did not start")
+
+
+def throughput(megabytes, chunk=65536):
+    total = megabytes << 20
+    block = os.urandom(chunk)
+    sock = connect()
+
+    def send():
+        for _ in range(total // chunk):
+            sock.sendall(block)
+
+    sender = threading.Thread(target=send)
+    start = time.perf_counter()
+    sender.start()
+    received = 0
+    while received < total:
+        received += len(sock.recv(1 << 20))
+    elapsed = time.perf_counter() - start
+    sender.join()
+    sock.close()
+    return megabytes / elapsed
+
+
+def latency(count=5000, size=64):
+    message = b"x" * size
+    sock = connect()
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        sock.sendall(message)
+        received = 0
+        while received < size:
+            received += len(sock.recv(size))
+        times.append(time.perf_counter() - start)
+    sock.close()
+    times.sort()
+    return times[int(len(times) * 0.99)] * 1e6
+
+
+def bench(megabytes):
+    for mode in ("stream", "transport"):
+        server = multiprocessing.Process(target=serve, args=(mode,))
+        server.start()
+        try:
+            rate = throughput(megabytes)
+            p99 = latency()
+        finally:
+            server.terminate()
+            server.join()
+        print(f"{mode:>9}: {rate:8.1f} MB/s  p99 {p99:7.1f} us")
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 256)
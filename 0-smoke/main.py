@@ -1,4 +1,10 @@
 import asyncio
+from os import getenv
+
+
+READ_SIZE = int(getenv("READ_SIZE", 65536))
+HIGH_WATER = int(getenv("HIGH_WATER", 1 << 20))  # pause reading above
+LOW_WATER = int(getenv("LOW_WATER", 1 << 18))  # resume reading below
 
 
 async def on_connect(reader, writer):
@@ -15,11 +21,57 @@ async def on_connect(reader, writer):
         writer.close()
 
 
-async def main():
-    server = await asyncio.start_server(on_connect, port=12345)
+class Echo(asyncio.BufferedProtocol):
+    """transport-level echo
+
+       the transport reads straight into a preallocated buffer of
+       read_size bytes and each read is written back as bytes: one copy,
+       since a transport may keep what it can't send at once by
+       reference, and the buffer is reused by the next read. when unsent
+       output passes the high watermark, reading pauses until it drains
+       below the low watermark.
+    """
+
+    def __init__(self, read_size=READ_SIZE, high=HIGH_WATER, low=LOW_WATER):
+        self.view = memoryview(bytearray(read_size))
+        self.high = high
+        self.low = low
+
+    @classmethod
+    def create(cls):
+        return cls()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.set_write_buffer_limits(self.high, self.low)
+        self.host, self.port = transport.get_extra_info("peername")[:2]
+        print(f"connection from {self.host}:{self.port}")
+
+    def get_buffer(self, sizehint):
+        return self.view
+
+    def buffer_updated(self, nbytes):
+        self.transport.write(bytes(self.view[:nbytes]))
+
+    def pause_writing(self):
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        self.transport.resume_reading()
+
+    def connection_lost(self, exc):
+        print(f"closed connection {self.host}:{self.port}")
+
+
+async def main(port=12345, mode="stream"):
+    if mode == "transport":
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(Echo.create, port=port)
+    else:
+        server = await asyncio.start_server(on_connect, port=port)
     print(f"listening on port {server.sockets[0].getsockname()[1]}")
     await server.serve_forever()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(mode=getenv("MODE", "stream")))
@@ -0,0 +1,54 @@
+"""requests/second for the line-at-a-time and pipelined handlers
+
+   usage: python bench_pipeline.py [requests]
+"""
+import asyncio
+import contextlib
+import io
+import random
+import sys
+import time
+
+import main
+
+
+def requests(count):
+    rand = random.Random(5)
+    return [b'{"method":"isPrime","number":%d}\n' % rand.randint(0, 10 ** 9)
+            for _ in range(count)]
+
+
+async def run(handler, lines, depth):
+    server = await asyncio.start_server(
+        handler, host="127.0.0.1", port=0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    start = time.perf_counter()
+    for beg in range(0, len(lines), depth):
+        batch = lines[beg:beg + depth]
+        writer.write(b"".join(batch))
+        for _ in batch:
+            await reader.readline()
+    elapsed = time.perf_counter() - start
+    writer.close()
+    await writer.wait_closed()
+    await asyncio.sleep(0.01)  # let the handler see eof and finish
+    server.close()
+    return len(lines) / elapsed
+
+
+async def bench(count):
+    main.engine.start()
+    lines = requests(count)
+    print(f"codec: {main.codec.name}")
+    for depth in (1, 10, 1000):
+        for name, handler in (("line", main.on_connect),
+                              ("pipeline", main.on_connect_pipelined)):
+            with contextlib.redirect_stdout(io.StringIO()):
+                rate = await run(handler, lines, depth)
+            print(f"depth {depth:>4} {name:>8}: {rate:10,.0f} req/s")
+    main.engine.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000))
@@ -0,0 +1,45 @@
+import json
+
+
+class JsonCodec:
+    """standard library json; loads takes bytes, dumps returns bytes"""
+
+    name = "json"
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(value):
+        return json.dumps(value).encode()
+
+
+class OrjsonCodec(JsonCodec):
+    """orjson, falling back to json for what orjson rejects (notably
+       integers wider than 64 bits) so accept/reject behavior matches"""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+
+    def loads(self, data):
+        try:
+            return self.orjson.loads(data)
+        except self.orjson.JSONDecodeError:
+            return json.loads(data)
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec, OrjsonCodec)}
+
+
+def get_codec(name=None):
+    """named codec, or the fastest one installed if name is None"""
+    if name:
+        return CODECS[name]()
+    try:
+        return OrjsonCodec()
+    except ImportError:
+        return JsonCodec()
@@ -1,20 +1,30 @@
 import asyncio
 import json
+from os import getenv
 
+from codec import get_codec
+from prime import PrimeEngine
 
-def is_prime(num):
-    if int(num) != float(num):
-        return False
-    if num <= 1:
-        return False
-    if num == 2:
-        return True
-    if num % 2 == 0:
-        return False
-    for i in range(3, int(num ** 0.5) + 1, 2):
-        if num % i == 0:
-            return False
-    return True
+
+engine = PrimeEngine(
+    sieve_limit=int(getenv("SIEVE_LIMIT", 10_000_000)),
+    sieve_file=getenv("SIEVE_FILE"))  # mapped at startup if it exists
+codec = get_codec(getenv("JSON_CODEC"))
+answers = {prime: codec.dumps({"method": "isPrime", "prime": prime}) + b"\n"
+           for prime in (False, True)}
+LINE_LIMIT = 2 ** 16  # bytes, the stream limit readline enforces
+
+
+def get_number(request):
+    method = request["method"]
+    if method != "isPrime":
+        raise Exception(f"invalid method: {method}")
+    number = request["number"]
+    if isinstance(number, bool):
+        raise Exception(f"invalid number (boolean): {number}")
+    if not isinstance(number, (int, float)):
+        raise Exception(f"invalid number: {number}")
+    return number
 
 
 async def on_connect(reader, writer):
@@ -25,16 +35,9 @@ async def on_connect(reader, writer):
         while (data := await reader.readline()):
             data = data.decode()
             print(f"[{host}:{port}] {data}")
-            jdata = json.loads(data)
-            method = jdata["method"]
-            if method != "isPrime":
-                raise Exception(f"invalid method: {method}")
-            number = jdata["number"]
-            if isinstance(number, bool):
-                raise Exception(f"invalid number (boolean): {number}")
-            if not isinstance(number, (int, float)):
-                raise Exception(f"invalid number: {number}")
-            result = {"method": "isPrime", "prime": is_prime(number)}
+            number = get_number(json.loads(data))
+            prime = await engine.is_prime(number)
+            result = {"method": "isPrime", "prime": prime}
             writer.write(json.dumps(result).encode())
             writer.write(b"\n")
             await writer.drain()
@@ -45,11 +48,52 @@ async def on_connect(reader, writer):
         writer.close()
 
 
-async def main():
-    server = await asyncio.start_server(on_connect, port=12345)
+async def answer(lines, writer):
+    """answer a batch of request lines with a single write; a bad line
+       stops the batch (after answering the lines before it)"""
+    response = []
+    try:
+        for line in lines:
+            number = get_number(codec.loads(line))
+            response.append(answers[await engine.is_prime(number)])
+    finally:
+        writer.write(b"".join(response))
+
+
+async def on_connect_pipelined(reader, writer):
+    host, port = writer.get_extra_info("peername")[:2]
+    print(f"connection from {host}:{port}")
+
+    buffer = bytearray()
+    try:
+        while (data := await reader.read(65536)):
+            buffer += data
+            if (end := buffer.rfind(b"\n")) >= 0:
+                lines = buffer[:end].split(b"\n")
+                del buffer[:end + 1]
+                await answer(lines, writer)
+                await writer.drain()
+            if len(buffer) > LINE_LIMIT:
+                raise ValueError("line longer than the limit")
+        if buffer:  # unterminated last line, as readline would return it
+            await answer([buffer], writer)
+    except Exception as exc:
+        print(f"exception {host}:{port} {repr(exc)}")
+    finally:
+        print(f"closed connection {host}:{port}")
+        writer.close()
+
+
+async def main(port=12345, mode="line"):
+    engine.start()
+    handler = on_connect_pipelined if mode == "pipeline" else on_connect
+    server = await asyncio.start_server(handler, port=port)
     print(f"listening on port {server.sockets[0].getsockname()[1]}")
-    await server.serve_forever()
+    try:
+        await server.serve_forever()
+    finally:
+        engine.stop()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(mode=getenv("MODE", "line")))
@@ -0,0 +1,212 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from math import isqrt
+import mmap
+import os
+
+
+MR_LIMIT = 1 << 64
+MR_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)  # exact below 2^64
+
+
+def miller_rabin(num, bases=MR_BASES):
+    """deterministic for num < 2^64 with the default bases, otherwise
+       a strong probable-prime test"""
+    if num < 2:
+        return False
+    for base in bases:
+        if num % base == 0:
+            return num == base
+    d, s = num - 1, 0
+    while not d & 1:
+        d >>= 1
+        s += 1
+    for base in bases:
+        x = pow(base, d, num)
+        if x == 1 or x == num - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % num
+            if x == num - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def jacobi(a, n):
+    """the Jacobi symbol (a/n), n odd and positive"""
+    a %= n
+    result = 1
+    while a:
+        while not a & 1:
+            a >>= 1
+            if n & 7 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a & 3 == 3 and n & 3 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+
+def strong_lucas(num):
+    """strong Lucas probable-prime test with Selfridge's parameters (the
+       first D of 5, -7, 9, -11, ... with (D/num) = -1, P = 1, Q = (1-D)/4)
+       for odd num that isn't a perfect square"""
+    d = 5
+    while (symbol := jacobi(d, num)) != -1:
+        if symbol == 0 and abs(d) != num:
+            return False  # d shares a factor with num
+        d = -d - 2 if d > 0 else -d + 2
+    q = (1 - d) // 4
+    k, s = num + 1, 0
+    while not k & 1:
+        k >>= 1
+        s += 1
+    # U, V and Q^i for i = 1, then by the bits of k: doubling i takes
+    # U(2i) = U V, V(2i) = V^2 - 2Q^i; adding one, with P = 1, takes
+    # U(i+1) = (U + V) / 2, V(i+1) = (D U + V) / 2 (halved mod num)
+    u, v, qk = 1, 1, q % num
+    for bit in bin(k)[3:]:
+        u, v = u * v % num, (v * v - 2 * qk) % num
+        qk = qk * qk % num
+        if bit == "1":
+            u, v = (u + v) % num, (d * u + v) % num
+            u = (u + num if u & 1 else u) >> 1
+            v = (v + num if v & 1 else v) >> 1
+            qk = qk * q % num
+    if u == 0 or v == 0:
+        return True
+    for _ in range(s - 1):
+        v = (v * v - 2 * qk) % num
+        if v == 0:
+            return True
+        qk = qk * qk % num
+    return False
+
+
+def big_is_prime(num):
+    """run in a worker process for num >= 2^64: Baillie-PSW, a strong
+       base 2 test then a strong Lucas test. no composite is known to pass
+       both, but none has been proven not to exist either, so above 2^64
+       the answer is that of a probable-prime test"""
+    if not miller_rabin(num, MR_BASES):  # small factors, then 12 bases
+        return False
+    if isqrt(num) ** 2 == num:
+        return False
+    return strong_lucas(num)
+
+
+class Sieve:
+    """primality bitmap of the odd numbers below limit
+
+       bit i is set when 2i+1 is prime. the bitmap can be saved to a file
+       and mapped back in at startup instead of being recomputed.
+    """
+
+    def __init__(self, bits, limit):
+        self.bits = bits
+        self.limit = limit
+
+    @classmethod
+    def build(cls, limit):
+        limit = -(-limit // 16) * 16  # whole bytes of odd numbers
+        size = limit // 2
+        odd = bytearray(b"\x01") * size  # odd[i] -> 2i+1
+        odd[0] = 0  # 1
+        for i in range(1, (int(limit ** 0.5) + 1) // 2):
+            if odd[i]:
+                p = 2 * i + 1
+                start = p * p // 2
+                odd[start::p] = bytes(len(range(start, size, p)))
+        # pack a byte per number into a bit per number, in C
+        digits = odd.translate(bytes.maketrans(b"\x00\x01", b"01"))[::-1]
+        bits = int(digits, 2).to_bytes((size + 7) // 8, "little")
+        return cls(bits, limit)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            bits = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(bits, len(bits) * 16)
+
+    def save(self, path):
+        with open(path, "wb") as file:
+            file.write(self.bits)
+
+    def __contains__(self, num):
+        if num < 2:
+            return False
+        if not num & 1:
+            return num == 2
+        i = num >> 1
+        return bool(self.bits[i >> 3] >> (i & 7) & 1)
+
+
+class PrimeEngine:
+    """sieve lookup below the sieve limit, Miller-Rabin up to 2^64, and
+       a process pool beyond that so the event loop never blocks.
+       recent answers are kept in a small LRU cache.
+    """
+
+    def __init__(self, sieve_limit=10_000_000, sieve_file=None,
+                 cache_size=4096, workers=None):
+        self.sieve_limit = sieve_limit
+        self.sieve_file = sieve_file
+        self.cache_size = cache_size
+        self.workers = workers
+        self.cache = OrderedDict()
+        self.sieve = None
+        self.pool = None
+
+    def start(self):
+        if self.sieve_file and os.path.exists(self.sieve_file):
+            self.sieve = Sieve.load(self.sieve_file)
+        else:
+            self.sieve = Sieve.build(self.sieve_limit)
+            if self.sieve_file:
+                self.sieve.save(self.sieve_file)
+        self.pool = ProcessPoolExecutor(self.workers)
+        return self
+
+    def stop(self):
+        if self.pool:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    @staticmethod
+    def normalize(num):
+        """integer value of num, or None if it isn't a whole number"""
+        if isinstance(num, float):
+            if not num.is_integer():  # also inf and nan
+                return None
+            num = int(num)
+        return num
+
+    def check(self, num):
+        """answer without blocking, or None if num needs the pool"""
+        if num < self.sieve.limit:
+            return num in self.sieve
+        if (result := self.cache.get(num)) is not None:
+            self.cache.move_to_end(num)
+            return result
+        if num < MR_LIMIT:
+            return self.remember(num, miller_rabin(num))
+        return None
+
+    def remember(self, num, result):
+        self.cache[num] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    async def is_prime(self, num):
+        if (num := self.normalize(num)) is None:
+            return False
+        if (result := self.check(num)) is None:
+            loop = asyncio.get_running_loop()
+            result = self.remember(
+                num, await loop.run_in_executor(self.pool, big_is_prime, num))
+        return result
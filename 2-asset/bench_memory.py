@@ -0,0 +1,53 @@
+"""bytes per record: list of (timestamp, price) tuples vs PriceIndex columns
+
+   usage: python bench_memory.py [records]
+"""
+import random
+import sys
+import tracemalloc
+
+from index import PriceIndex
+
+
+def measure(build, count):
+    tracemalloc.start()
+    data = build(count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return data, size
+
+
+def records(count):
+    rand = random.Random(2)
+    for timestamp in range(count):
+        yield timestamp, rand.randint(-2 ** 31, 2 ** 31 - 1)
+
+
+def build_list(count):
+    data = []
+    for record in records(count):
+        data.append(record)
+    return data
+
+
+def build_index(count, spill=None):
+    data = PriceIndex(spill)
+    for timestamp, price in records(count):
+        data.insert(timestamp, price)
+    return data
+
+
+def main(count):
+    print(f"{count} records")
+    for name, build in (
+            ("list of tuples", build_list),
+            ("PriceIndex", build_index),
+            ("PriceIndex spill=1MB", lambda c: build_index(c, 1 << 20))):
+        data, size = measure(build, count)
+        print(f"{name:>22}: {size / count:6.1f} bytes/record (heap)")
+        if isinstance(data, PriceIndex):
+            data.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300_000)
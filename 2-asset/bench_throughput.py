@@ -0,0 +1,54 @@
+"""pipelined messages/second: readexactly loop vs batched FrameProtocol
+
+   usage: python bench_throughput.py [messages]
+"""
+import asyncio
+import random
+import sys
+import time
+from struct import pack
+
+from main import AssetProtocol, on_connect
+
+
+def workload(count):
+    rand = random.Random(3)
+    messages = []
+    queries = 0
+    for timestamp in range(count):
+        if rand.random() < 0.1:
+            beg = rand.randint(0, timestamp)
+            messages.append(pack("!cii", b"Q", beg, beg + 1000))
+            queries += 1
+        else:
+            price = rand.randint(1, 999)
+            messages.append(pack("!cii", b"I", timestamp, price))
+    return b"".join(messages), queries
+
+
+async def run(server, payload, queries):
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    start = time.perf_counter()
+    writer.write(payload)
+    await reader.readexactly(queries * 4)
+    elapsed = time.perf_counter() - start
+    writer.close()
+    server.close()
+    return elapsed
+
+
+async def main(count):
+    payload, queries = workload(count)
+    loop = asyncio.get_running_loop()
+    for name, server in (
+            ("readexactly", await asyncio.start_server(
+                on_connect, host="127.0.0.1", port=0)),
+            ("batched", await loop.create_server(
+                AssetProtocol.create, host="127.0.0.1", port=0))):
+        elapsed = await run(server, payload, queries)
+        print(f"{name:>12}: {count / elapsed:12,.0f} msgs/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000))
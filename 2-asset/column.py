@@ -0,0 +1,97 @@
+from array import array
+import mmap
+import tempfile
+
+
+class Column:
+    """growable typed array with an optional memory-mapped temp file backing
+
+       capacity doubles as the column fills. once the buffer would exceed
+       spill bytes (if given) it moves to an anonymous temp file so the
+       pages can be evicted instead of living on the heap.
+    """
+
+    def __init__(self, typecode, capacity=64, spill=None):
+        self.typecode = typecode
+        self.itemsize = array(typecode).itemsize
+        self.spill = spill
+        self.length = 0
+        self.capacity = 0
+        self.buffer = None
+        self.file = None
+        self.view = memoryview(b"").cast(typecode)
+        self.reserve(capacity)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("column index out of range")
+        return self.view[index]
+
+    @property
+    def nbytes(self):
+        return self.capacity * self.itemsize
+
+    @property
+    def spilled(self):
+        return self.file is not None
+
+    def allocate(self, size):
+        if self.spill is None or size <= self.spill:
+            return bytearray(size)
+        if self.file is None:
+            self.file = tempfile.TemporaryFile()
+        self.file.truncate(size)
+        return mmap.mmap(self.file.fileno(), size)
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        size = max(capacity, self.capacity * 2) * self.itemsize
+        buffer = self.allocate(size)
+        view = memoryview(buffer).cast(self.typecode)
+        view[:self.length] = self.view[:self.length]
+        self.view.release()
+        if isinstance(self.buffer, mmap.mmap) and self.buffer is not buffer:
+            self.buffer.close()
+        self.buffer = buffer
+        self.view = view
+        self.capacity = len(view)
+
+    def append(self, value):
+        if self.length == self.capacity:
+            self.reserve(self.length + 1)
+        self.view[self.length] = value
+        self.length += 1
+
+    def insert(self, index, value):
+        if self.length == self.capacity:
+            self.reserve(self.length + 1)
+        length = self.length
+        self.view[index + 1:length + 1] = self.view[index:length]
+        self.view[index] = value
+        self.length += 1
+
+    def extend(self, values):
+        values = array(self.typecode, values)
+        end = self.length + len(values)
+        self.reserve(end)
+        self.view[self.length:end] = memoryview(values)
+        self.length = end
+
+    def truncate(self, length):
+        self.length = min(length, self.length)
+
+    def values(self, start=0):
+        return self.view[start:self.length]
+
+    def close(self):
+        self.view.release()
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        if self.file:
+            self.file.close()
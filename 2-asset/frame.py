@@ -0,0 +1,52 @@
+import asyncio
+from struct import Struct
+
+
+class FrameProtocol(asyncio.Protocol):
+    """fixed-size binary frames decoded in bulk
+
+       every data_received decodes all complete frames with one
+       iter_unpack and hands them to on_frames, which returns the
+       response bytes (if any) for the batch; these go out in one write.
+       a partial frame stays buffered until the rest arrives.
+
+       subclasses set format (a struct format string) and on_frames.
+    """
+
+    format = None
+
+    def __init__(self):
+        self.struct = Struct(self.format)
+        self.buffer = bytearray()
+        self.transport = None
+
+    @classmethod
+    def create(cls):
+        return cls()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        buffer = self.buffer
+        buffer += data
+        usable = len(buffer) - len(buffer) % self.struct.size
+        if not usable:
+            return
+        with memoryview(buffer) as view, view[:usable] as complete:
+            # decoded up front: if on_frames raised while holding an
+            # iterator, its traceback would keep the buffer exported
+            frames = list(self.struct.iter_unpack(complete))
+        del buffer[:usable]
+        response = self.on_frames(frames)
+        if response:
+            self.transport.write(response)
+
+    def pause_writing(self):
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        self.transport.resume_reading()
+
+    def on_frames(self, frames):
+        raise NotImplementedError()
@@ -0,0 +1,69 @@
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+from column import Column
+
+
+class PriceIndex:
+    """timestamp-sorted prices with running sums for O(log n) mean queries
+
+       in-order inserts append in O(1); an out-of-order insert lands in its
+       sorted position and marks the running sums dirty from that point on,
+       to be rebuilt (once) by the next query.
+
+       columns are typed arrays (8 bytes per record plus 8 for the sum),
+       optionally spilling to a temp file past spill bytes per column.
+    """
+
+    def __init__(self, spill=None):
+        self.timestamps = Column("i", spill=spill)
+        self.prices = Column("i", spill=spill)
+        self.sums = Column("q", spill=spill)  # sums[i] == sum(prices[:i])
+        self.sums.append(0)
+        self.dirty = None  # first index of sums that needs rebuilding
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def nbytes(self):
+        return self.timestamps.nbytes + self.prices.nbytes + self.sums.nbytes
+
+    def insert(self, timestamp, price):
+        if not self.timestamps or timestamp >= self.timestamps[-1]:
+            self.timestamps.append(timestamp)
+            self.prices.append(price)
+            if self.dirty is None:
+                self.sums.append(self.sums[-1] + price)
+            return
+
+        pos = bisect_right(self.timestamps.view, timestamp,
+                           0, len(self.timestamps))
+        self.timestamps.insert(pos, timestamp)
+        self.prices.insert(pos, price)
+        if self.dirty is None or pos < self.dirty:
+            self.dirty = pos
+
+    def rebuild(self):
+        start = self.dirty
+        base = self.sums[start]
+        self.sums.truncate(start)
+        self.sums.extend(accumulate(self.prices.values(start), initial=base))
+        self.dirty = None
+
+    def mean(self, beg, end):
+        if beg > end:
+            return 0
+        if self.dirty is not None:
+            self.rebuild()
+        count = len(self.timestamps)
+        lo = bisect_left(self.timestamps.view, beg, 0, count)
+        hi = bisect_right(self.timestamps.view, end, lo, count)
+        if hi <= lo:
+            return 0
+        return int((self.sums[hi] - self.sums[lo]) / (hi - lo))
+
+    def close(self):
+        self.timestamps.close()
+        self.prices.close()
+        self.sums.close()
@@ -1,35 +1,73 @@
 import asyncio
-from struct import pack, unpack
+from os import getenv
+from struct import Struct, pack, unpack
+
+from frame import FrameProtocol
+from index import PriceIndex
+
+
+# per-column bytes before a session's prices move to a temp file (0 = never)
+SPILL_SIZE = int(getenv("SPILL_SIZE", 0)) or None
+
+answer = Struct("!i")
 
 
 async def on_connect(reader, writer):
     host, port = writer.get_extra_info("peername")[:2]
     print(f"connection from {host}:{port}")
 
-    data = []
+    data = PriceIndex(SPILL_SIZE)
     try:
         while (packet := await reader.readexactly(9)):
             packet = unpack("!cii", packet)
             if packet[0] == b"I":
-                data.append(packet[1:])
+                data.insert(*packet[1:])
             elif packet[0] == b"Q":
-                beg, end = packet[1:]
-                subset = [item[1] for item in data
-                          if item[0] >= beg and item[0] <= end]
-                result = int(sum(subset) / len(subset)) if subset else 0
-                result = pack("!i", result)
+                result = pack("!i", data.mean(*packet[1:]))
                 writer.write(result)
                 await writer.drain()
     finally:
         print(f"closed connection {host}:{port}")
+        data.close()
         writer.close()
 
 
-async def main():
-    server = await asyncio.start_server(on_connect, port=12345)
+class AssetProtocol(FrameProtocol):
+    """batched alternative to on_connect: each read is decoded in one pass
+       and all of its query answers are written together"""
+
+    format = "!cii"
+
+    def connection_made(self, transport):
+        super().connection_made(transport)
+        self.host, self.port = transport.get_extra_info("peername")[:2]
+        print(f"connection from {self.host}:{self.port}")
+        self.data = PriceIndex(SPILL_SIZE)
+
+    def connection_lost(self, exc):
+        print(f"closed connection {self.host}:{self.port}")
+        self.data.close()
+
+    def on_frames(self, frames):
+        insert, mean = self.data.insert, self.data.mean
+        results = []
+        for kind, one, two in frames:
+            if kind == b"I":
+                insert(one, two)
+            elif kind == b"Q":
+                results.append(answer.pack(mean(one, two)))
+        return b"".join(results)
+
+
+async def main(port=12345, mode="stream"):
+    if mode == "batch":
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(AssetProtocol.create, port=port)
+    else:
+        server = await asyncio.start_server(on_connect, port=port)
     print(f"listening on port {server.sockets[0].getsockname()[1]}")
     await server.serve_forever()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(mode=getenv("MODE", "stream")))
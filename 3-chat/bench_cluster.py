@@ -0,0 +1,101 @@
+"""chat messages/second delivered: single process vs N SO_REUSEPORT workers
+
+   the server runs in a child process (output discarded). clients join,
+   a subset talks, and the rate is deliveries until every client has
+   heard every message (or gone quiet for a second, if some were
+   dropped by the slow-consumer policy). the load generator is one
+   asyncio process, so on small machines it can be the limit rather
+   than the server.
+
+   usage: python bench_cluster.py [clients] [talkers] [messages]
+"""
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+import cluster
+import main
+
+
+def serve(workers, port):
+    sys.stdout = sys.stderr = open(os.devnull, "w")
+    if workers:
+        cluster.run(workers, port)
+    else:
+        asyncio.run(main.main(port))
+
+
+async def join(name, port):
+    for _ in range(50):
+        try:
+            reader, writer = await asyncio.open_connection(
+                "127.0.0.1", port)
+            break
+        except OSError:
+            await asyncio.sleep(0.1)
+    await reader.readline()  # what's your name?
+    writer.write(f"{name}\n".encode())
+    await reader.readline()  # the room contains
+    return reader, writer
+
+
+async def listen(reader, expected):
+    received = 0
+    try:
+        while received < expected:
+            await asyncio.wait_for(reader.readline(), 1)
+            received += 1
+    except asyncio.TimeoutError:
+        pass
+    return received
+
+
+async def run(port, clients, talkers, messages):
+    members = [await join(f"user{i}", port) for i in range(clients)]
+    await asyncio.sleep(0.5)  # let the entered notices settle
+    for reader, _ in members:
+        while True:
+            try:
+                await asyncio.wait_for(reader.readline(), 0.05)
+            except asyncio.TimeoutError:
+                break
+
+    start = time.perf_counter()
+    listeners = [asyncio.create_task(listen(
+        reader, messages * (talkers - (i < talkers))))
+        for i, (reader, _) in enumerate(members)]
+    for n in range(messages):
+        for _, writer in members[:talkers]:
+            writer.write(f"message number {n}\n".encode())
+        await asyncio.sleep(0)
+    received = sum(await asyncio.gather(*listeners))
+    elapsed = time.perf_counter() - start
+    expected = sum(messages * (talkers - (i < talkers))
+                   for i in range(clients))
+
+    for _, writer in members:
+        writer.close()
+    return received / elapsed, expected - received
+
+
+def bench(clients, talkers, messages):
+    print(f"{clients=} {talkers=} {messages=} cpus={os.cpu_count()}")
+    for workers in (0, 1, 2, 4):
+        # a fresh port each round: exiting workers may still hold the last
+        port = 12390 + workers
+        server = multiprocessing.Process(target=serve, args=(workers, port))
+        server.start()
+        try:
+            rate, lost = asyncio.run(run(port, clients, talkers, messages))
+        finally:
+            server.terminate()
+            server.join()
+        name = f"{workers} workers" if workers else "single"
+        print(f"{name:>10}: {rate:10,.0f} deliveries/s  {lost=}")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    bench(*(args + [50, 10, 200][len(args):]))
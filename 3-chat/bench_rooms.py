@@ -0,0 +1,124 @@
+"""broadcast fan-out with many members and a few slow readers
+
+   members are simulated writers: fast ones accept everything, slow ones
+   take SLOW_DELAY seconds per drain. compares the old gather-per-message
+   notify with Room under each slow-consumer policy, and write
+   coalescing per event-loop tick against a short flush window.
+
+   usage: python bench_rooms.py [members] [slow] [talkers] [messages]
+"""
+import asyncio
+import sys
+import time
+
+from room import POLICIES, Member, Room
+
+
+SLOW_DELAY = 0.05
+QUEUE_SIZE = 64
+
+
+class FakeWriter:
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.received = 0
+        self.writes = 0
+        self.closed = False
+
+    def write(self, data):
+        self.received += 1
+        self.writes += 1
+
+    def writelines(self, data):
+        self.received += len(data)
+        self.writes += 1
+
+    async def drain(self):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+
+    def close(self):
+        self.closed = True
+
+    def is_closing(self):
+        return self.closed
+
+
+class LegacyRoom:
+    """the original notify: encode per recipient, gather every drain"""
+
+    def __init__(self):
+        self.members = {}
+
+    async def broadcast(self, message, exclude=None):
+
+        async def send(stream, message):
+            stream.write(message.encode())
+            await stream.drain()
+
+        await asyncio.gather(*[send(writer, message)
+                               for name, writer in self.members.items()
+                               if name != exclude])
+
+
+async def talk(room, name, messages, latencies):
+    for i in range(messages):
+        start = time.perf_counter()
+        await room.broadcast(f"[{name}] message number {i}\n", exclude=name)
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0)
+
+
+async def scenario(room, members, slow, talkers, messages):
+    writers = {}
+    for i in range(members):
+        name = f"user{i}"
+        writer = FakeWriter(SLOW_DELAY if i < slow else 0)
+        writers[name] = writer
+        room.members[name] = (writer if isinstance(room, LegacyRoom)
+                              else Member(writer, room))
+    speakers = [f"user{members - 1 - i}" for i in range(talkers)]
+    fast = [(writer, messages * (talkers - (name in speakers)))
+            for name, writer in writers.items() if not writer.delay]
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[talk(room, name, messages, latencies)
+                           for name in speakers])
+    sent = time.perf_counter() - start
+    while any(writer.received < expected for writer, expected in fast):
+        await asyncio.sleep(0.001)
+    delivered = time.perf_counter() - start
+
+    for member in room.members.values():
+        if isinstance(member, Member):
+            member.close()
+    latencies.sort()
+    deliveries = sum(w.received for w in writers.values())
+    return {
+        "deliveries/s": deliveries / delivered,
+        "send p99 ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "send total s": sent,
+        "writes": sum(w.writes for w in writers.values()),
+        "dropped": getattr(room, "dropped", 0),
+        "disconnected": getattr(room, "disconnected", 0),
+        "coalescing": getattr(room, "stats", ""),
+    }
+
+
+async def main(members, slow, talkers, messages):
+    print(f"{members=} {slow=} {talkers=} {messages=}")
+    rooms = [("legacy", LegacyRoom)] + [
+        (policy, lambda p=policy: Room(QUEUE_SIZE, p)) for policy in POLICIES
+    ] + [("drop 5ms", lambda: Room(QUEUE_SIZE, "drop", flush_window=0.005))]
+    for name, make in rooms:
+        result = await scenario(make(), members, slow, talkers, messages)
+        print(f"{name:>10}: " + "  ".join(
+            f"{key} {val:,.2f}" if isinstance(val, float) else f"{key} {val}"
+            for key, val in result.items() if val != ""))
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [1000, 5, 10, 50][len(args):])))
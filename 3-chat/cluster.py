@@ -0,0 +1,153 @@
+"""multi-process chat: N workers accept on one port with SO_REUSEPORT
+
+   the parent process runs a hub on a unix socket. the hub owns room
+   membership and puts every join, leave and message into one order,
+   relaying each event to all workers, which deliver it to their local
+   members. every client sees the same sequence as with a single process.
+
+   hub protocol: one json object per line
+     worker -> hub: join {name}, leave {name}, send {text, exclude}
+     hub -> worker: joined {name, ok, others} (to the joining worker)
+                    send {text, exclude} (to every worker)
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import tempfile
+
+
+def encode(**message):
+    return json.dumps(message).encode() + b"\n"
+
+
+async def hub(sock):
+    names = {}  # name -> worker writer
+    workers = set()
+
+    async def relay(text, exclude=None):
+        """send to every worker and wait for all of them to drain: a slow
+           worker holds the hub back (and, through it, the senders) rather
+           than its buffer growing without bound. a worker gone away is
+           its own handler's to clean up"""
+        message = encode(op="send", text=text, exclude=exclude)
+        for writer in workers:
+            writer.write(message)
+        await asyncio.gather(*(writer.drain() for writer in workers),
+                             return_exceptions=True)
+
+    async def on_worker(reader, writer):
+        workers.add(writer)
+        try:
+            while (line := await reader.readline()):
+                message = json.loads(line)
+                op, name = message["op"], message.get("name")
+                if op == "join":
+                    ok = name not in names
+                    writer.write(encode(op="joined", name=name, ok=ok,
+                                        others=", ".join(names.keys())))
+                    if ok:
+                        names[name] = writer
+                        await relay(f"* {name} has entered the room\n", name)
+                elif op == "leave":
+                    if names.pop(name, None):
+                        await relay(f"* {name} has left the room\n")
+                elif op == "send":
+                    await relay(message["text"], message["exclude"])
+                await writer.drain()
+        finally:
+            workers.discard(writer)
+            for name in [n for n, w in names.items() if w is writer]:
+                del names[name]
+                await relay(f"* {name} has left the room\n")
+            writer.close()
+
+    server = await asyncio.start_unix_server(on_worker, sock=sock)
+    await server.serve_forever()
+
+
+class BusRoom:
+    """Room stand-in for a worker: membership changes and broadcasts go
+       through the hub; events coming back are delivered to the local room
+       strictly in hub order"""
+
+    def __init__(self, local):
+        self.local = local
+        self.pending = {}  # name -> (writer, future) awaiting the hub
+        self.hub = None
+
+    @property
+    def stats(self):
+        return self.local.stats
+
+    async def connect(self, path):
+        reader, self.hub = await asyncio.open_unix_connection(path)
+        asyncio.create_task(self.receive(reader))
+
+    async def receive(self, reader):
+        try:
+            while (line := await reader.readline()):
+                message = json.loads(line)
+                if message["op"] == "send":
+                    await self.local.broadcast(
+                        message["text"], message["exclude"])
+                elif message["op"] == "joined":
+                    name = message["name"]
+                    writer, future = self.pending.pop(name)
+                    if message["ok"]:
+                        self.local.add(name, writer, message["others"])
+                    future.set_result(message["ok"])
+        except Exception as exc:
+            print(f"hub connection failed: {repr(exc)}")
+            raise SystemExit(1) from exc  # the worker can't go on alone
+        raise SystemExit("hub closed")
+
+    async def join(self, name, writer):
+        if name in self.pending or name in self.local.members:
+            raise Exception("duplicate user")
+        future = asyncio.get_running_loop().create_future()
+        self.pending[name] = (writer, future)
+        self.hub.write(encode(op="join", name=name))
+        if not await future:
+            raise Exception("duplicate user")
+
+    async def leave(self, name):
+        if member := self.local.members.pop(name, None):
+            member.close()
+            self.hub.write(encode(op="leave", name=name))
+
+    async def broadcast(self, message, exclude=None):
+        self.hub.write(encode(op="send", text=message, exclude=exclude))
+        await self.hub.drain()
+
+
+def worker(path, port):
+    import main
+
+    async def serve():
+        main.room = BusRoom(main.room)
+        await main.room.connect(path)
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(("", port))
+        server = await asyncio.start_server(main.on_connect, sock=sock)
+        print(f"worker {os.getpid()} listening on port {port}")
+        await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def run(workers, port=12345):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "hub")
+        sock = socket.socket(socket.AF_UNIX)
+        sock.bind(path)
+        sock.listen()
+        processes = [multiprocessing.Process(target=worker,
+                                             args=(path, port), daemon=True)
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        asyncio.run(hub(sock))
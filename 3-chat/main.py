@@ -1,8 +1,13 @@
 import asyncio
+from os import getenv
 import re
 
+from room import Room
 
-users = {}
+
+room = Room(int(getenv("QUEUE_SIZE", 1024)), getenv("POLICY", "drop"),
+            flush_window=float(getenv("FLUSH_WINDOW", 0)),  # seconds
+            flush_bytes=int(getenv("FLUSH_BYTES", 65536)))
 
 
 async def send(stream, message):
@@ -10,12 +15,6 @@ async def send(stream, message):
     await stream.drain()
 
 
-async def notify(message, exclude=None):
-    work = [send(writer, message) for name, writer in users.items()
-            if name != exclude]
-    await asyncio.gather(*work)
-
-
 async def on_connect(reader, writer):
     host, port = writer.get_extra_info("peername")[:2]
     print(f"connection from {host}:{port}")
@@ -29,19 +28,14 @@ async def on_connect(reader, writer):
             raise Exception("name is null")
         if not re.match("[a-zA-Z0-9]+$", name):
             raise Exception("invalid characters in name")
-        if name in users:
-            raise Exception("duplicate user")
-        await notify(f"* {name} has entered the room\n")
-        await send(writer, "* the room contains: "
-                   f"{', '.join(name for name in users.keys())}\n")
-        users[name] = writer
-
-        while (line := await reader.readline()):
-            line = line.decode()
-            await notify(f"[{name}] {line}", exclude=name)
-
-        del users[name]
-        await notify(f"* {name} has left the room\n")
+        await room.join(name, writer)
+
+        try:
+            while (line := await reader.readline()):
+                line = line.decode()
+                await room.broadcast(f"[{name}] {line}", exclude=name)
+        finally:
+            await room.leave(name)
     except Exception as exc:
         print(f"exception {host}:{port} {exc}")
     finally:
@@ -49,11 +43,23 @@ async def on_connect(reader, writer):
         writer.close()
 
 
-async def main():
-    server = await asyncio.start_server(on_connect, port=12345)
+async def report(interval):
+    while True:
+        await asyncio.sleep(interval)
+        print(f"stats {room.stats}")
+
+
+async def main(port=12345):
+    server = await asyncio.start_server(on_connect, port=port)
     print(f"listening on port {server.sockets[0].getsockname()[1]}")
+    if interval := float(getenv("STATS_INTERVAL", 0)):
+        asyncio.create_task(report(interval))
     await server.serve_forever()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if (workers := int(getenv("WORKERS", 1))) > 1:
+        from cluster import run
+        run(workers)  # workers share membership through a hub process
+    else:
+        asyncio.run(main())
@@ -0,0 +1,163 @@
+import asyncio
+
+
+POLICIES = ("drop", "disconnect", "block")
+
+
+class Stats:
+    """what write coalescing saved (writes vs messages) and what it cost
+       (delay from a batch's first message being queued to its write)"""
+
+    def __init__(self):
+        self.messages = 0
+        self.writes = 0
+        self.delay_total = 0.0
+        self.delay_max = 0.0
+
+    @property
+    def writes_saved(self):
+        return self.messages - self.writes
+
+    @property
+    def delay_mean(self):
+        return self.delay_total / self.writes if self.writes else 0.0
+
+    def __str__(self):
+        return (f"messages={self.messages} writes={self.writes}"
+                f" saved={self.writes_saved}"
+                f" delay_mean={self.delay_mean * 1000:.3f}ms"
+                f" delay_max={self.delay_max * 1000:.3f}ms")
+
+
+class Member:
+    """one connection's outbound side: a bounded queue of encoded
+       messages drained by its own writer task
+
+       the writer task coalesces: everything queued by the time it runs
+       (plus whatever arrives during flush_window seconds, if set) goes
+       out in one writelines, up to about flush_bytes per write.
+    """
+
+    def __init__(self, writer, room):
+        self.writer = writer
+        self.room = room
+        self.queue = asyncio.Queue(room.queue_size)
+        self.since = None  # when the oldest unwritten message was queued
+        self.closed = asyncio.get_running_loop().create_future()
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        queue, room, stats = self.queue, self.room, self.room.stats
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                batch = [await queue.get()]
+                if self.writer.is_closing():  # peer gone, awaiting leave
+                    break
+                if room.flush_window:
+                    await asyncio.sleep(room.flush_window)
+                size = len(batch[0])
+                while size < room.flush_bytes and not queue.empty():
+                    message = queue.get_nowait()
+                    batch.append(message)
+                    size += len(message)
+                if self.since is not None:
+                    delay = loop.time() - self.since
+                    stats.delay_total += delay
+                    stats.delay_max = max(stats.delay_max, delay)
+                # leftovers get a fresh start time (an underestimate)
+                self.since = loop.time() if not queue.empty() else None
+                stats.messages += len(batch)
+                stats.writes += 1
+                self.writer.writelines(batch)
+                await self.writer.drain()
+        except ConnectionError:
+            self.close()
+
+    def put(self, message):
+        """queue without waiting; raises asyncio.QueueFull"""
+        self.queue.put_nowait(message)
+        if self.since is None:
+            self.since = asyncio.get_running_loop().time()
+
+    async def put_wait(self, message):
+        """wait for queue space, giving up if the member closes"""
+        if self.closed.done():
+            return
+        try:
+            self.put(message)
+        except asyncio.QueueFull:
+            put = asyncio.ensure_future(self.queue.put(message))
+            await asyncio.wait((put, self.closed),
+                               return_when=asyncio.FIRST_COMPLETED)
+            put.cancel()
+            if self.since is None:
+                self.since = asyncio.get_running_loop().time()
+
+    def close(self):
+        if not self.closed.done():
+            self.closed.set_result(None)
+            self.task.cancel()
+            self.writer.close()
+
+
+class Room:
+    """chat room with per-member outbound queues
+
+       each message is encoded once and queued to every recipient; a
+       slow reader only fills its own queue. when a queue is full the
+       policy decides: drop the message for that member, disconnect the
+       member, or block the sender until there is space (broadcasts are
+       then serialized so every member sees the same order).
+    """
+
+    def __init__(self, queue_size=1024, policy="drop",
+                 flush_window=0, flush_bytes=65536):
+        if policy not in POLICIES:
+            raise ValueError(f"invalid policy: {policy}")
+        self.queue_size = queue_size
+        self.policy = policy
+        self.flush_window = flush_window
+        self.flush_bytes = flush_bytes
+        self.stats = Stats()
+        self.members = {}
+        self.lock = asyncio.Lock()
+        self.dropped = 0
+        self.disconnected = 0
+
+    async def broadcast(self, message, exclude=None):
+        message = message.encode()
+        if self.policy == "block":
+            async with self.lock:
+                for name, member in list(self.members.items()):
+                    if name != exclude:
+                        await member.put_wait(message)
+            return
+
+        for name, member in self.members.items():
+            if name == exclude or member.closed.done():
+                continue
+            try:
+                member.put(message)
+            except asyncio.QueueFull:
+                if self.policy == "drop":
+                    self.dropped += 1
+                else:
+                    self.disconnected += 1
+                    member.close()  # its reader sees eof and leaves
+
+    async def join(self, name, writer):
+        if name in self.members:
+            raise Exception("duplicate user")
+        self.add(name, writer, ", ".join(self.members.keys()))
+        await self.broadcast(f"* {name} has entered the room\n", exclude=name)
+
+    def add(self, name, writer, others):
+        member = Member(writer, self)
+        member.put(f"* the room contains: {others}\n".encode())
+        self.members[name] = member
+
+    async def leave(self, name):
+        if member := self.members.pop(name, None):
+            member.close()
+            await self.broadcast(f"* {name} has left the room\n")
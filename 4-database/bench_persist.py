@@ -0,0 +1,73 @@
+"""insert throughput with persistence off/on, and recovery time
+
+   inserts go straight through Store.handle (no network) while the
+   group-commit thread runs. recovery builds a store of that many keys,
+   snapshots it, adds a log tail, and times a fresh load.
+
+   usage: python bench_persist.py [inserts] [recovery keys]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from engine import Store
+from persist import Persistence
+
+
+def inserts(count):
+    return [b"key%d=value number %d" % (i, i) for i in range(count)]
+
+
+def throughput(store, messages):
+    handle = store.handle
+    start = time.perf_counter()
+    for message in messages:
+        handle(message)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def wait_for_snapshot(persistence):
+    while persistence.child:
+        persistence.reap()
+        time.sleep(0.05)
+
+
+def main(count, keys):
+    directory = tempfile.mkdtemp()
+    try:
+        messages = inserts(count)
+        rate = throughput(Store(b"bench"), messages)
+        print(f"persistence off: {rate:12,.0f} inserts/s")
+
+        persistence = Persistence(os.path.join(directory, "throughput"))
+        store = Store(b"bench", persistence)
+        persistence.start(store.data)
+        rate = throughput(store, messages)
+        print(f"persistence on:  {rate:12,.0f} inserts/s")
+        persistence.close()
+        del messages, store
+
+        persistence = Persistence(os.path.join(directory, "recovery"))
+        store = Store(b"bench", persistence)
+        store.data.update((b"key%d" % i, b"key%d=value number %d" % (i, i))
+                          for i in range(keys))
+        persistence.compact(store.data)
+        wait_for_snapshot(persistence)
+        for message in inserts(keys // 100):  # a 1% log tail to replay
+            store.handle(message)
+        persistence.close()
+        del store
+
+        start = time.perf_counter()
+        store = Store(b"bench", Persistence(persistence.directory))
+        elapsed = time.perf_counter() - start
+        print(f"recovered {len(store.data) - 1:,} keys in {elapsed:.2f}s")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [1_000_000, 10_000_000][len(args):]))
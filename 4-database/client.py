@@ -1,15 +1,67 @@
 import socket
 import sys
+import threading
+import time
 
 
 server = ("localhost", 12345)
 
-client = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
 
-while True:
-    line = sys.stdin.readline().strip()
-    client.sendto(line.encode(), server)
-    if "=" not in line:
-        message, address = client.recvfrom(1000)
-        message = message.decode()
-        print(message)
+def interactive(client):
+    while True:
+        line = sys.stdin.readline().strip()
+        client.sendto(line.encode(), server)
+        if "=" not in line:
+            message, address = client.recvfrom(1000)
+            message = message.decode()
+            print(message)
+
+
+def load(client, seconds=5.0, keys=1000, inserts=0.5):
+    """send a mix of inserts and retrieves as fast as possible, then
+       report datagrams/second and the share of retrieves never answered"""
+    messages = [f"key{i}={'v' * (i % 50)}".encode() for i in range(keys)]
+    queries = [f"key{i}".encode() for i in range(keys)]
+    every = round(1 / inserts) if inserts else 0
+    received = 0
+
+    def receive():
+        nonlocal received
+        client.settimeout(1)
+        try:
+            while True:
+                client.recvfrom(1000)
+                received += 1
+        except socket.timeout:
+            pass
+
+    receiver = threading.Thread(target=receive)
+    receiver.start()
+    sent = retrieves = 0
+    start = time.perf_counter()
+    end = start + seconds
+    while time.perf_counter() < end:
+        for _ in range(1000):
+            i = sent % keys
+            if every and sent % every == 0:
+                client.sendto(messages[i], server)
+            else:
+                client.sendto(queries[i], server)
+                retrieves += 1
+            sent += 1
+    elapsed = time.perf_counter() - start
+    receiver.join()
+
+    lost = retrieves - received
+    print(f"sent {sent} datagrams ({sent / elapsed:,.0f}/s),"
+          f" {received} replies ({received / elapsed:,.0f}/s),"
+          f" lost {lost} ({lost / max(retrieves, 1):.1%} of retrieves)")
+
+
+if __name__ == "__main__":
+    client = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+    if sys.argv[1:2] == ["load"]:  # client.py load [seconds] [keys]
+        args = sys.argv[2:4]
+        load(client, *(cast(arg) for cast, arg in zip((float, int), args)))
+    else:
+        interactive(client)
@@ -0,0 +1,73 @@
+import selectors
+import socket
+import threading
+
+
+MAX_DATAGRAM = 1000
+
+
+class Store:
+    """bytes-native key/value store
+
+       an insert datagram "key=value" is kept whole, since it is exactly
+       the reply to a later retrieve of key; nothing is decoded or
+       formatted per packet.
+
+       with persistence (see persist.py), the store starts from what was
+       saved and every insert is also queued for the log.
+    """
+
+    def __init__(self, version, persistence=None):
+        self.data = persistence.load() if persistence else {}
+        self.data[b"version"] = b"version=" + version
+        self.log = persistence.append if persistence else None
+
+    def handle(self, message):
+        """apply one datagram, returning the reply (or None for inserts)"""
+        key, sep, _ = message.partition(b"=")
+        if sep:
+            if key != b"version":
+                self.data[key] = message
+                if self.log:
+                    self.log(message)
+            return None
+        return self.data.get(message) or message + b"="
+
+
+def bind(host, port, reuseport=False):
+    sock = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+    if reuseport:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.setblocking(False)
+    return sock
+
+
+def serve(sock, store):
+    """wait for the socket to be readable, then drain it until EAGAIN"""
+    recvfrom, sendto, handle = sock.recvfrom, sock.sendto, store.handle
+    with selectors.DefaultSelector() as selector:
+        selector.register(sock, selectors.EVENT_READ)
+        while True:
+            selector.select()
+            while True:
+                try:
+                    message, address = recvfrom(MAX_DATAGRAM)
+                except BlockingIOError:
+                    break
+                if (reply := handle(message)) is not None:
+                    try:
+                        sendto(reply, address)
+                    except BlockingIOError:
+                        pass  # send buffer full: drop, as udp may
+
+
+def run(host, port, store, workers=1):
+    """serve on workers SO_REUSEPORT sockets, one thread each, all
+       sharing store (dict operations are atomic under the GIL)"""
+    socks = [bind(host, port, reuseport=workers > 1) for _ in range(workers)]
+    threads = [threading.Thread(target=serve, args=(sock, store), daemon=True)
+               for sock in socks[1:]]
+    for thread in threads:
+        thread.start()
+    serve(socks[0], store)
@@ -1,28 +1,22 @@
-import socket
+from engine import Store, run
+from persist import Persistence
 
 
-def main(host, port):
-    store = {"version": "release-1.0"}
-    server = socket.socket(
-        family=socket.AF_INET, type=socket.SOCK_DGRAM)
-    server.bind((host, port))
+def main(host, port, workers=1, directory=None):
+    persistence = Persistence(directory) if directory else None
+    store = Store(b"release-1.0", persistence)
+    if persistence:
+        print(f"loaded {len(store.data) - 1} keys from {directory}")
+        persistence.start(store.data)
     print(f"listening on {port}")
-
-    while True:
-        message, address = server.recvfrom(1000)
-        message = message.decode()
-        print(address, message)
-
-        if "=" in message:
-            key, value = message.split("=", 1)
-            if key != "version":
-                store[key] = value
-        else:
-            value = store.get(message, "")
-            response = f"{message}={value}"
-            server.sendto(response.encode(), address)
+    try:
+        run(host, port, store, workers)
+    finally:
+        if persistence:
+            persistence.close()
 
 
 if __name__ == "__main__":
     from os import getenv
-    main(getenv("HOST", "127.0.0.1"), int(getenv("PORT", 12345)))
+    main(getenv("HOST", "127.0.0.1"), int(getenv("PORT", 12345)),
+         int(getenv("WORKERS", 1)), getenv("DATA_DIR"))
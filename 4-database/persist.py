@@ -0,0 +1,177 @@
+"""optional persistence: snapshot + append-only log
+
+   inserts are queued in memory by the serving threads and written by a
+   background thread every interval seconds with one write and one fsync
+   (group commit), so the datagram path never touches the disk.
+
+   the log is split into numbered segments. once the current segment
+   passes compact_bytes, a new segment is started and a forked child
+   writes the store as it stood at that moment to the snapshot, which
+   then covers every earlier segment, and those are deleted.
+
+   a failed write or fsync (a full disk, say) is reported and retried
+   every interval, in a new segment since the failed one may end in part
+   of a record; inserts queue up in memory meanwhile.
+
+   on disk, in directory:
+     snapshot   marshal of (first segment not covered, {key: datagram})
+     log.N      records of u16 length + insert datagram
+"""
+from collections import deque
+import contextlib
+import marshal
+import mmap
+import os
+from struct import Struct
+import threading
+
+
+record = Struct("!H")
+
+
+class Persistence:
+
+    def __init__(self, directory, interval=0.01, compact_bytes=64 << 20):
+        self.directory = directory
+        self.interval = interval
+        self.compact_bytes = compact_bytes
+        self.pending = deque()
+        self.append = self.pending.append  # the hot path
+        self.segment = None
+        self.file = None
+        self.size = 0
+        self.unwritten = b""  # records a failed write must retry
+        self.error = None  # what is failing, while it is
+        self.child = None  # (pid, first segment it covers up to)
+        self.stopping = threading.Event()
+        self.thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def segments(self):
+        return sorted(int(name[4:]) for name in os.listdir(self.directory)
+                      if name.startswith("log."))
+
+    def load(self):
+        """the stored {key: datagram}, from snapshot and log replay
+
+           all of it: the store serves from a dict in memory, so every
+           datagram in the snapshot is unmarshalled into a bytes object
+           at startup. mapping the file only spares a copy of it whole
+           before unmarshalling."""
+        data, covered = {}, 0
+        if os.path.exists(self.path("snapshot")):
+            with open(self.path("snapshot"), "rb") as file, \
+                    mmap.mmap(file.fileno(), 0,
+                              access=mmap.ACCESS_READ) as snapshot:
+                covered, data = marshal.loads(snapshot)
+
+        for segment in self.segments():
+            if segment < covered:
+                os.unlink(self.path(f"log.{segment}"))
+                continue
+            with open(self.path(f"log.{segment}"), "rb") as file:
+                log = file.read()
+            pos = 0
+            while pos + 2 <= len(log):
+                end = pos + 2 + record.unpack_from(log, pos)[0]
+                if end > len(log):
+                    break  # torn write at the tail
+                message = log[pos + 2:end]
+                data[message.partition(b"=")[0]] = message
+                pos = end
+            covered = segment + 1
+        self.open_segment(covered)
+        return data
+
+    def open_segment(self, segment):
+        if self.file:
+            self.file.close()
+        self.segment = segment
+        self.file = open(self.path(f"log.{segment}"), "ab")
+        self.size = self.file.tell()
+
+    def flush(self):
+        popleft, pack = self.pending.popleft, record.pack
+        chunk = [self.unwritten]
+        for _ in range(len(self.pending)):
+            message = popleft()
+            chunk.append(pack(len(message)))
+            chunk.append(message)
+        chunk = b"".join(chunk)
+        if not chunk:
+            return
+        retry, self.unwritten = self.unwritten, chunk
+        if retry:  # the last write failed, maybe part way through a record
+            failed, empty = self.segment, not self.size
+            with contextlib.suppress(OSError):
+                self.file.close()  # dropping what it couldn't write
+            self.open_segment(failed + 1)
+            if empty:  # nothing in it but the failed write: drop it
+                os.unlink(self.path(f"log.{failed}"))
+        self.file.write(chunk)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unwritten = b""
+        self.size += len(chunk)
+
+    def compact(self, data):
+        """start a new segment and snapshot data in a forked child"""
+        self.open_segment(self.segment + 1)
+        pid = os.fork()
+        if pid == 0:  # child: data is a copy-on-write view of this moment
+            status = 1
+            try:
+                tmp = self.path("snapshot.tmp")
+                with open(tmp, "wb") as file:
+                    marshal.dump((self.segment, data), file)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(tmp, self.path("snapshot"))
+                status = 0
+            finally:
+                os._exit(status)
+        self.child = (pid, self.segment)
+
+    def reap(self):
+        pid, covered = self.child
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            self.child = None
+            if status == 0:
+                for segment in self.segments():
+                    if segment < covered:
+                        os.unlink(self.path(f"log.{segment}"))
+
+    def run(self, data):
+        while not self.stopping.wait(self.interval):
+            try:
+                self.flush()
+                if self.child:
+                    self.reap()
+                elif self.size > self.compact_bytes:
+                    self.compact(data)
+            except Exception as exc:
+                if not self.error:
+                    print(f"persistence failed, retrying: {repr(exc)}")
+                self.error = exc
+            else:
+                if self.error:
+                    print("persistence recovered")
+                    self.error = None
+
+    def start(self, data):
+        self.thread = threading.Thread(target=self.run, args=(data,),
+                                       daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """stop the background thread, then the final flush; call after
+           serving has stopped"""
+        if self.thread:
+            self.stopping.set()
+            self.thread.join()
+        self.flush()
+        self.file.close()
@@ -0,0 +1,65 @@
+"""session setup time through the proxy, with and without the pool
+
+   a local stand-in for the chat server greets each connection after
+   DELAY seconds (standing in for handshake and network round trips).
+   each session connects to the proxy and waits for the greeting.
+
+   usage: python bench_pool.py [sessions]
+"""
+import asyncio
+import contextlib
+import io
+import sys
+import time
+
+import main
+from pool import UpstreamPool
+
+
+DELAY = 0.02
+
+
+async def upstream(reader, writer):
+    await asyncio.sleep(DELAY)
+    writer.write(b"Welcome to budgetchat! What shall I call you?\n")
+    with contextlib.suppress(ConnectionError):
+        while (line := await reader.readline()):
+            writer.write(line)
+    writer.close()
+
+
+async def sessions(port, count):
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await reader.readline()
+        times.append(time.perf_counter() - start)
+        writer.close()
+        await asyncio.sleep(0.005)  # let the pool refill between sessions
+    times.sort()
+    return sum(times) / len(times), times[int(len(times) * 0.99)]
+
+
+async def bench(count):
+    up = await asyncio.start_server(upstream, host="127.0.0.1", port=0)
+    up_port = up.sockets[0].getsockname()[1]
+    for size in (0, 4):
+        main.pool = UpstreamPool("localhost", up_port, size=size)
+        main.pool.start()
+        proxy = await asyncio.start_server(
+            main.on_connect, host="127.0.0.1", port=0)
+        port = proxy.sockets[0].getsockname()[1]
+        await asyncio.sleep(0.1)  # pre-warm
+        with contextlib.redirect_stdout(io.StringIO()):
+            mean, p99 = await sessions(port, count)
+        print(f"pool size {size}: mean {mean * 1000:6.2f}ms"
+              f"  p99 {p99 * 1000:6.2f}ms  {main.pool}")
+        proxy.close()
+        main.pool.close()
+    up.close()
+    await asyncio.sleep(DELAY * 2)  # let handlers see their peers close
+
+
+if __name__ == "__main__":
+    asyncio.run(bench(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
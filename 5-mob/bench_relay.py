@@ -0,0 +1,103 @@
+"""relay throughput and memory: original str relay vs streaming bytes relay
+
+   a local echo server stands in for the upstream. throughput streams
+   lines (some with boguscoin addresses) through the proxy and back;
+   the memory run does the same with a client that reads slowly and
+   reports the proxy's peak traced allocation.
+
+   usage: python bench_relay.py [megabytes]
+"""
+import asyncio
+import contextlib
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+import main
+from pool import UpstreamPool
+
+
+async def legacy_handle_connection(id, is_client, reader, writer):
+    """the relay before the streaming rewrite"""
+    try:
+        while not reader.at_eof():
+            line = await reader.readline()
+            if line:
+                line = line.decode()
+                print(f"->{'client' if is_client else 'server'}:{id}" + line)
+                line = re.sub(r"(?<!\S)7[a-zA-Z0-9]{25,34}(?!\S)",
+                              main.hack, line)
+                print(f"<--{'server' if is_client else 'client'}:{id}" + line)
+                writer.write(line.encode())
+    except Exception as exc:
+        print(f"exception {'client' if is_client else 'server'}:{id} {exc}")
+    finally:
+        writer.close()
+
+
+async def echo(reader, writer):
+    with contextlib.suppress(ConnectionError):
+        while (data := await reader.read(65536)):
+            writer.write(data)
+            await writer.drain()
+    writer.close()
+
+
+def payload(megabytes):
+    lines = [b"[alice] just some ordinary chat text without the digit\n",
+             b"[bob] pay 7iKDZEwPZSqIvDnHvVN2r0hUWXD5rHX for the 7 things\n"]
+    line = b"".join(lines * 8)
+    return line * ((megabytes << 20) // len(line))
+
+
+async def transfer(port, data, read_size=65536, read_delay=0):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+    async def send():
+        for beg in range(0, len(data), 65536):
+            writer.write(data[beg:beg + 65536])
+            await writer.drain()
+        writer.write_eof()  # the proxy closes its side once relayed
+
+    sender = asyncio.create_task(send())
+    received = 0
+    start = time.perf_counter()
+    while (chunk := await reader.read(read_size)):
+        received += len(chunk)
+        if read_delay:
+            await asyncio.sleep(read_delay)
+    elapsed = time.perf_counter() - start
+    await sender
+    writer.close()
+    return received / elapsed / (1 << 20)
+
+
+async def bench(megabytes):
+    up = await asyncio.start_server(echo, host="127.0.0.1", port=0)
+    main.pool = UpstreamPool("127.0.0.1", up.sockets[0].getsockname()[1],
+                             size=0)
+    data = payload(megabytes)
+    for name, handler in (("original", legacy_handle_connection),
+                          ("streaming", main.handle_connection)):
+        main.handle_connection = handler
+        proxy = await asyncio.start_server(
+            main.on_connect, host="127.0.0.1", port=0)
+        port = proxy.sockets[0].getsockname()[1]
+        with open(os.devnull, "w") as devnull, \
+                contextlib.redirect_stdout(devnull):
+            rate = await transfer(port, data)
+            tracemalloc.start()
+            await transfer(port, data, read_size=4096, read_delay=0.002)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        print(f"{name:>9}: {rate:7.1f} MB/s,"
+              f" slow reader peak {peak / (1 << 20):6.1f} MB")
+        proxy.close()
+    up.close()
+    await asyncio.sleep(0.1)
+
+
+if __name__ == "__main__":
+    asyncio.run(bench(int(sys.argv[1]) if len(sys.argv) > 1 else 8))
@@ -1,22 +1,42 @@
 import asyncio
+from os import getenv
 import re
 
+from pool import UpstreamPool
 
-up_url = "chat.protohackers.com"
-up_port = 16963
+
+up_url = getenv("UPSTREAM_HOST", "chat.protohackers.com")
+up_port = int(getenv("UPSTREAM_PORT", 16963))
 hack = "7YWHMfk9JZe0LM0g1ZauHuiSxhI"
 
+pool = UpstreamPool(
+    up_url, up_port,
+    size=int(getenv("POOL_SIZE", 4)),  # 0 connects per session
+    idle_limit=float(getenv("POOL_IDLE", 30)),  # seconds
+    dns_ttl=float(getenv("DNS_TTL", 60)))  # seconds
+
+
+boguscoin = re.compile(rb"(?<!\S)7[a-zA-Z0-9]{25,34}(?!\S)")
+replacement = hack.encode()
+
+
+def rewrite(line):
+    if b"7" not in line:  # no address possible: skip the regex
+        return line
+    return boguscoin.sub(replacement, line)
+
 
 async def handle_connection(id, is_client, reader, writer):
+    """relay lines as bytes, rewriting boguscoin addresses
+
+       drain after each write: when the destination falls behind, this
+       stops reading the source, whose buffer then fills to its limit and
+       pauses that socket, so memory stays bounded in both directions.
+    """
     try:
-        while not reader.at_eof():
-            line = await reader.readline()
-            if line:
-                line = line.decode()
-                print(f"->{'client' if is_client else 'server'}:{id}" + line)
-                line = re.sub(r"(?<!\S)7[a-zA-Z0-9]{25,34}(?!\S)", hack, line)
-                print(f"<--{'server' if is_client else 'client'}:{id}" + line)
-                writer.write(line.encode())
+        while (line := await reader.readline()):
+            writer.write(rewrite(line))
+            await writer.drain()
     except Exception as exc:
         print(f"exception {'client' if is_client else 'server'}:{id} {exc}")
     finally:
@@ -28,15 +48,27 @@ async def on_connect(reader, writer):
     host, port = writer.get_extra_info("peername")[:2]
     print(f"connection from {host}:{port}")
     id = f"{port} "
-    up_reader, up_writer = await asyncio.open_connection(up_url, up_port)
+    up_reader, up_writer = await pool.acquire()
     asyncio.create_task(handle_connection(id, False, up_reader, writer))
     await handle_connection(id, True, reader, up_writer)
 
 
+async def report(interval):
+    while True:
+        await asyncio.sleep(interval)
+        print(f"pool {pool}")
+
+
 async def main(port=12345):
+    pool.start()
     server = await asyncio.start_server(on_connect, port=port)
     print(f"listening on port {port}")
-    await server.serve_forever()
+    if interval := float(getenv("STATS_INTERVAL", 0)):
+        asyncio.create_task(report(interval))
+    try:
+        await server.serve_forever()
+    finally:
+        pool.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+import asyncio
+from collections import deque
+import socket
+
+
+class Resolver:
+    """getaddrinfo results cached for ttl seconds; concurrent callers
+       share one lookup"""
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.cache = {}  # (host, port) -> (expires, future [address, ...])
+        self.lookups = 0
+
+    async def lookup(self, host, port):
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        return [info[4][:2] for info in infos]
+
+    async def resolve(self, host, port):
+        now = asyncio.get_running_loop().time()
+        if not (entry := self.cache.get((host, port))) or entry[0] <= now:
+            self.lookups += 1
+            entry = (now + self.ttl,
+                     asyncio.ensure_future(self.lookup(host, port)))
+            self.cache[host, port] = entry
+        try:
+            return await asyncio.shield(entry[1])
+        except OSError:
+            self.cache.pop((host, port), None)  # don't cache failures
+            raise
+
+
+class Upstream(asyncio.StreamReaderProtocol):
+    """stream protocol noting when the upstream closes or resets: the
+       reader's at_eof() stays false while the greeting is still buffered"""
+
+    def __init__(self, reader):
+        super().__init__(reader)
+        self.gone = False
+
+    def eof_received(self):
+        self.gone = True
+        return super().eof_received()
+
+    def connection_lost(self, exc):
+        self.gone = True
+        super().connection_lost(exc)
+
+
+async def open_upstream(host, port):
+    """asyncio.open_connection, with the Upstream protocol"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    transport, protocol = await loop.create_connection(
+        lambda: Upstream(reader), host, port)
+    return reader, asyncio.StreamWriter(transport, protocol, reader, loop)
+
+
+def closed(writer):
+    """whether the upstream has gone"""
+    return writer.is_closing() or writer.transport.get_protocol().gone
+
+
+class UpstreamPool:
+    """connections to one upstream, opened ahead of the sessions using them
+
+       size connections are kept open and ready; acquire hands one over
+       (and starts a replacement), or connects directly if none is ready.
+       connections idle longer than idle_limit seconds are closed and
+       replaced, since the upstream may drop them on its own, and so are
+       those it has already closed or reset.
+    """
+
+    def __init__(self, host, port, size=4, idle_limit=30, dns_ttl=60):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.idle_limit = idle_limit
+        self.resolver = Resolver(dns_ttl)
+        self.idle = deque()  # (opened at, reader, writer)
+        self.filling = 0
+        self.stats = dict(hits=0, misses=0, opened=0, expired=0, dead=0,
+                          failed=0)
+        self.reaper = None
+
+    def __str__(self):
+        stats = " ".join(f"{key}={val}" for key, val in self.stats.items())
+        return (f"{stats} ready={len(self.idle)}"
+                f" dns_lookups={self.resolver.lookups}")
+
+    async def connect(self):
+        error = None
+        for host, port in await self.resolver.resolve(self.host, self.port):
+            try:
+                connection = await open_upstream(host, port)
+                self.stats["opened"] += 1
+                return connection
+            except OSError as exc:
+                error = exc
+        self.stats["failed"] += 1
+        raise error or OSError(f"no address for {self.host}")
+
+    async def add(self):
+        try:
+            reader, writer = await self.connect()
+            loop = asyncio.get_running_loop()
+            self.idle.append((loop.time(), reader, writer))
+        except OSError as exc:
+            print(f"upstream connect failed: {exc}")
+        finally:
+            self.filling -= 1
+
+    def fill(self):
+        while len(self.idle) + self.filling < self.size:
+            self.filling += 1
+            asyncio.create_task(self.add())
+
+    def expire(self):
+        now = asyncio.get_running_loop().time()
+        for _ in range(len(self.idle)):
+            opened, reader, writer = item = self.idle.popleft()
+            if now - opened > self.idle_limit:
+                self.stats["expired"] += 1
+                writer.close()
+            elif closed(writer):
+                self.stats["dead"] += 1
+                writer.close()
+            else:
+                self.idle.append(item)
+
+    async def acquire(self):
+        self.expire()
+        if self.idle:
+            _, reader, writer = self.idle.popleft()
+            self.stats["hits"] += 1
+            self.fill()
+            return reader, writer
+        self.stats["misses"] += 1
+        self.fill()
+        return await self.connect()
+
+    async def maintain(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            self.expire()
+            self.fill()
+
+    def start(self):
+        self.fill()
+        self.reaper = asyncio.create_task(
+            self.maintain(max(self.idle_limit / 4, 0.1)))
+
+    def close(self):
+        if self.reaper:
+            self.reaper.cancel()
+        while self.idle:
+            self.idle.popleft()[2].close()
@@ -0,0 +1,141 @@
+"""ticket delivery under dispatcher churn: queue per road vs Dispatch
+
+   many roads, many dispatchers (each covering a random set of roads,
+   some of them slow readers), and a churn loop that aborts a random
+   dispatcher every few milliseconds and connects a replacement for the
+   same roads. tickets are submitted directly (no cameras). reports the
+   time until delivery settles, and tickets delivered, duplicated and
+   lost. aborted dispatchers also drop what sits unread in their own
+   socket buffers, which no server can recover; these are kept small
+   so that losses are mostly the server's.
+
+   usage: python bench_dispatch.py [tickets] [roads] [dispatchers]
+"""
+import asyncio
+from collections import Counter, defaultdict
+import contextlib
+import io
+import random
+import socket
+import sys
+import time
+from struct import pack
+
+from dispatch import Dispatch
+import main
+from protocol import DISPATCHER, Parser, encode_ticket
+
+
+TICKET_SIZE = 26  # with 8 byte plates
+
+legacy_roads = defaultdict(asyncio.Queue)
+
+
+async def legacy_dispatch(road, writer):
+    """the per-road dispatch task used before Dispatch"""
+    queue = legacy_roads[road]
+    while not writer.is_closing():
+        ticket = await queue.get()
+        writer.write(ticket)
+        queue.task_done()
+
+
+async def legacy_on_connect(reader, writer):
+    dispatchers = []
+    parser = Parser()
+    try:
+        while (data := await reader.read(65536)):
+            for message in parser.feed(data):
+                dispatchers.extend(
+                    asyncio.create_task(legacy_dispatch(road, writer))
+                    for road in message.roads)
+    except ConnectionError:
+        pass
+    finally:
+        for task in dispatchers:
+            task.cancel()
+        writer.close()
+
+
+async def dispatcher(port, roads, slow, received):
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", port))
+    reader, writer = await asyncio.open_connection(sock=sock)
+    writer.write(pack(f"!BB{len(roads)}H", DISPATCHER, len(roads), *roads))
+    buffer = b""
+    try:
+        while (data := await reader.read(4096 if slow else 65536)):
+            buffer += data
+            usable = len(buffer) - len(buffer) % TICKET_SIZE
+            for beg in range(0, usable, TICKET_SIZE):
+                received[int(buffer[beg + 2:beg + 10])] += 1
+            buffer = buffer[usable:]
+            if slow:
+                await asyncio.sleep(0.005)
+    except ConnectionError:
+        pass
+    finally:
+        writer.transport.abort()  # unread data is lost with it
+
+
+async def run(handler, submit, tickets, roads, count):
+    rand = random.Random(18)
+    server = await asyncio.start_server(handler, host="127.0.0.1", port=0)
+    port = server.sockets[0].getsockname()[1]
+    received = Counter()
+    coverage = [sorted({*range(i, roads, count),  # every road is covered
+                        *rand.sample(range(roads), 20)})
+                for i in range(count)]
+    clients = [asyncio.create_task(
+        dispatcher(port, coverage[i], i % 5 == 0, received))
+        for i in range(count)]
+    await asyncio.sleep(0.2)
+
+    async def churn():
+        while True:
+            await asyncio.sleep(0.005)
+            i = rand.randrange(count)
+            clients[i].cancel()
+            clients[i] = asyncio.create_task(
+                dispatcher(port, coverage[i], i % 5 == 0, received))
+
+    churner = asyncio.create_task(churn())
+    start = time.perf_counter()
+    for seq in range(tickets):
+        road = rand.randrange(roads)
+        submit(road, encode_ticket(b"%08d" % seq, road, 1, 0, 2, 3600, 9000))
+        if seq % 100 == 99:
+            await asyncio.sleep(0.001)
+    churner.cancel()
+    settled, total = time.perf_counter(), -1
+    while total != (total := sum(received.values())):
+        settled = time.perf_counter()
+        await asyncio.sleep(1)
+    for client in clients:
+        client.cancel()
+    server.close()
+    await asyncio.sleep(0.1)
+    return settled - start, received
+
+
+async def bench(tickets, roads, count):
+    main.dispatch = Dispatch()
+    runs = (("queue per road", legacy_on_connect,
+             lambda road, ticket: legacy_roads[road].put_nowait(ticket)),
+            ("Dispatch", main.on_connect,
+             lambda road, ticket: main.dispatch.submit(road, ticket)))
+    for name, handler, submit in runs:
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, received = await run(handler, submit, tickets, roads,
+                                          count)
+        duplicates = sum(n - 1 for n in received.values())
+        print(f"{name:>14}: settled in {elapsed:5.2f}s, delivered"
+              f" {len(received):,}/{tickets:,}, duplicates {duplicates:,},"
+              f" lost {tickets - len(received):,}")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(bench(*(args + [200_000, 1000, 100][len(args):])))
@@ -0,0 +1,87 @@
+"""end-to-end plates/second from a flood of cameras
+
+   each camera connects, identifies itself and sends all its plate
+   readings in bulk, then a bad message; the server's error reply marks
+   the point where every reading before it has been handled. compared
+   against a camera handler decoding with readexactly per field.
+
+   usage: python bench_flood.py [cameras] [plates per camera]
+"""
+import asyncio
+import contextlib
+import os
+import random
+import sys
+import time
+from struct import pack
+
+import main
+from bench_parser import legacy_message
+from observe import Observations
+from protocol import CAMERA, PLATE, encode_error
+
+
+async def legacy_on_connect(reader, writer):
+    """a camera session decoded the way on_connect did before the Parser"""
+    try:
+        while True:
+            message = await legacy_message(reader)
+            if len(message) == 3:
+                road, mile, limit = message
+            else:
+                plate, timestamp = message
+                for tkt in main.observations.add(plate.encode(), road, mile,
+                                                 timestamp, limit):
+                    main.ticket(*tkt)
+    except Exception as exc:
+        writer.write(encode_error(str(exc)))
+    finally:
+        writer.close()
+
+
+def camera_stream(road, mile, plates, seed):
+    rand = random.Random(seed)
+    messages = [pack("!BHHH", CAMERA, road, mile, 60)]
+    for _ in range(plates):
+        plate = b"%05X" % rand.randrange(16 ** 5)
+        messages.append(pack(f"!BB{len(plate)}sL", PLATE, len(plate), plate,
+                             rand.randrange(86400 * 30)))
+    messages.append(b"\xff")
+    return b"".join(messages)
+
+
+async def camera(port, data):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(data)
+    await reader.read(1)  # the error reply
+    writer.close()
+
+
+async def flood(handler, streams):
+    main.observations = Observations()
+    main.roads.clear()
+    server = await asyncio.start_server(handler, host="127.0.0.1", port=0)
+    port = server.sockets[0].getsockname()[1]
+    start = time.perf_counter()
+    await asyncio.gather(*(camera(port, data) for data in streams))
+    elapsed = time.perf_counter() - start
+    server.close()
+    return elapsed
+
+
+async def bench(cameras, plates):
+    streams = [camera_stream(i % 10, i * 7 % 1000, plates, i)
+               for i in range(cameras)]
+    total = cameras * plates
+    with open(os.devnull, "w") as devnull, \
+            contextlib.redirect_stdout(devnull):
+        results = [(name, await flood(handler, streams))
+                   for name, handler in (("readexactly", legacy_on_connect),
+                                         ("Parser", main.on_connect))]
+    for name, elapsed in results:
+        print(f"{name:>11}: {total / elapsed:10,.0f} plates/s")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(bench(*(args + [200, 5000][len(args):])))
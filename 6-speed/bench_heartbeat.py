@@ -0,0 +1,79 @@
+"""cpu use for heartbeating clients: a task per client vs HeartbeatWheel
+
+   clients are in-memory writers (no sockets), each asking for a
+   heartbeat every 1-5 seconds. reports the process cpu time as a share
+   of the wall time, and heartbeats sent against those due.
+
+   usage: python bench_heartbeat.py [seconds] [clients ...]
+"""
+import asyncio
+import random
+import sys
+import time
+
+from heartbeat import HeartbeatWheel
+from protocol import HEARTBEAT_FRAME
+
+
+class Sink:
+    """stands in for a StreamWriter"""
+
+    __slots__ = ("sent",)
+
+    def __init__(self):
+        self.sent = 0
+
+    def write(self, data):
+        self.sent += 1
+
+    def is_closing(self):
+        return False
+
+
+async def heartbeat(writer, delay):
+    """the per-client task used before the wheel"""
+    delay = delay / 10
+    while not writer.is_closing():
+        await asyncio.sleep(delay)
+        writer.write(HEARTBEAT_FRAME)
+
+
+async def measure(start_clients, intervals, seconds):
+    writers = [Sink() for _ in intervals]
+    stop = start_clients(writers)
+    wall, cpu = time.perf_counter(), time.process_time()
+    await asyncio.sleep(seconds)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    stop()
+    due = sum(int(seconds * 10 / interval) for interval in intervals)
+    sent = sum(writer.sent for writer in writers)
+    return cpu / wall, sent / due
+
+
+async def bench(seconds, counts):
+    rand = random.Random(16)
+    for count in counts:
+        intervals = [rand.randrange(10, 51) for _ in range(count)]  # ds
+
+        def tasks(writers):
+            started = [asyncio.create_task(heartbeat(writer, interval))
+                       for writer, interval in zip(writers, intervals)]
+            return lambda: [task.cancel() for task in started]
+
+        def wheel(writers):
+            heartbeats = HeartbeatWheel()
+            for writer, interval in zip(writers, intervals):
+                heartbeats.add(writer, interval / 10)
+            return lambda: [heartbeats.remove(writer) for writer in writers]
+
+        for name, start_clients in (("tasks", tasks), ("wheel", wheel)):
+            share, sent = await measure(start_clients, intervals, seconds)
+            print(f"{count:>7,} clients, {name}: cpu {share:6.1%},"
+                  f" sent {sent:6.1%} of due heartbeats")
+            await asyncio.sleep(0.5)  # let cancelled tasks unwind
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    counts = [int(arg) for arg in sys.argv[2:]] or [10_000, 100_000]
+    asyncio.run(bench(seconds, counts))
@@ -0,0 +1,95 @@
+"""camera readings/second: full-history scan vs (plate, road) index
+
+   synthetic cars drive along roads past cameras, some over the limit,
+   and their readings arrive shuffled within a window. the original
+   check is replayed on a prefix (it is quadratic) to confirm both
+   issue the same tickets; the index then replays everything.
+
+   usage: python bench_observations.py [readings]
+"""
+from collections import defaultdict
+import random
+import sys
+import time
+
+from observe import Observations
+
+
+def legacy(readings):
+    """the check before the index, collecting tickets instead of queueing"""
+    observations = []
+    days_by_plate = defaultdict(set)
+    tickets = []
+    for plate, road, mile, timestamp, limit in readings:
+        observations.append([timestamp, road, mile, plate])
+        obs = sorted([[ts, ml] for ts, rd, ml, pt in observations
+                     if plate == pt and rd == road])
+        ticket_days = days_by_plate[plate]
+        t1, m1 = obs[0]
+        for t2, m2 in obs[1:]:
+            days = set((int(t1 / 86400), int(t2 / 86400)))
+            if ticket_days.isdisjoint(days):
+                duration = (t2 - t1) / 60 / 60
+                distance = abs(m1 - m2)
+                speed = distance / duration
+                if speed > limit:
+                    tickets.append((plate, road, m1, t1, m2, t2,
+                                    int(speed * 100)))
+                    ticket_days.update(days)
+            t1, m1 = t2, m2
+    return tickets
+
+
+def indexed(readings):
+    observations = Observations()
+    add = observations.add
+    tickets = []
+    for reading in readings:
+        tickets += add(*reading)
+    return tickets
+
+
+def workload(count, plates=10_000, roads=100, seed=6):
+    rand = random.Random(seed)
+    plates = [f"{rand.randrange(26 ** 4):04X}{i}" for i in range(plates)]
+    miles = {road: sorted(rand.sample(range(1, 1000), 8))
+             for road in range(roads)}
+    readings = []
+    clock = 0
+    while len(readings) < count:
+        plate, road = rand.choice(plates), rand.randrange(roads)
+        limit = 60
+        speed = rand.uniform(40, 80)  # mph
+        clock += rand.randrange(1, 600)
+        for mile in miles[road]:
+            timestamp = clock + int(mile / speed * 3600)
+            readings.append((plate, road, mile, timestamp, limit))
+    window = 64  # cameras report out of order within this many readings
+    for beg in range(0, len(readings), window):
+        chunk = readings[beg:beg + window]
+        rand.shuffle(chunk)
+        readings[beg:beg + window] = chunk
+    return readings[:count]
+
+
+def main(count):
+    readings = workload(count)
+    prefix = readings[:min(count, 20_000)]
+
+    start = time.perf_counter()
+    expected = legacy(prefix)
+    elapsed = time.perf_counter() - start
+    print(f"full scan: {len(prefix) / elapsed:12,.0f} readings/s"
+          f" ({len(prefix):,} readings)")
+    assert indexed(prefix) == expected, "tickets differ"
+    print(f"identical tickets on the prefix: {len(expected):,}")
+
+    start = time.perf_counter()
+    tickets = indexed(readings)
+    elapsed = time.perf_counter() - start
+    print(f"indexed:   {count / elapsed:12,.0f} readings/s"
+          f" ({count:,} readings, {len(tickets):,} tickets)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000)
@@ -0,0 +1,88 @@
+"""messages/second decoded: readexactly per field vs buffered Parser
+
+   a camera's stream of plate messages is decoded both ways: through a
+   StreamReader with one readexactly per field (as on_connect did), and
+   by feeding Parser the same bytes in 64k reads.
+
+   usage: python bench_parser.py [messages]
+"""
+import asyncio
+import random
+import sys
+import time
+from struct import pack, unpack
+
+from protocol import CAMERA, PLATE, Parser
+
+
+async def read_u8(reader):
+    return unpack("!B", await reader.readexactly(1))[0]
+
+
+async def read_u16(reader):
+    return unpack("!H", await reader.readexactly(2))[0]
+
+
+async def read_u32(reader):
+    return unpack("!L", await reader.readexactly(4))[0]
+
+
+async def read_string(reader):
+    length = await read_u8(reader)
+    value = await reader.readexactly(length)
+    return value.decode()
+
+
+async def legacy_message(reader):
+    """one message decoded the way on_connect did before the Parser"""
+    packet_type = ord(await reader.readexactly(1))
+    if packet_type == CAMERA:
+        return (await read_u16(reader), await read_u16(reader),
+                await read_u16(reader))
+    if packet_type == PLATE:
+        return await read_string(reader), await read_u32(reader)
+    raise Exception(f"illegal packet: {hex(packet_type)}")
+
+
+def workload(count, seed=15):
+    rand = random.Random(seed)
+    messages = [pack("!BHHH", CAMERA, 1, 8, 60)]
+    for timestamp in range(count):
+        plate = b"%07X" % rand.randrange(16 ** 7)
+        messages.append(pack(f"!BB{len(plate)}sL", PLATE, len(plate), plate,
+                             timestamp))
+    return b"".join(messages)
+
+
+async def legacy(data, count):
+    reader = asyncio.StreamReader(limit=len(data) + 1)
+    reader.feed_data(data)
+    reader.feed_eof()
+    for _ in range(count + 1):
+        await legacy_message(reader)
+
+
+def buffered(data, count):
+    parser = Parser()
+    decoded = 0
+    for beg in range(0, len(data), 65536):
+        decoded += len(parser.feed(data[beg:beg + 65536]))
+    assert decoded == count + 1
+
+
+def main(count):
+    data = workload(count)
+
+    start = time.perf_counter()
+    asyncio.run(legacy(data, count))
+    elapsed = time.perf_counter() - start
+    print(f"readexactly: {count / elapsed:12,.0f} messages/s")
+
+    start = time.perf_counter()
+    buffered(data, count)
+    elapsed = time.perf_counter() - start
+    print(f"Parser:      {count / elapsed:12,.0f} messages/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,82 @@
+"""rss over a simulated week of camera readings, with and without retention
+
+   cars drive along roads past cameras around the clock; readings are
+   generated as they go and fed straight to Observations (no network),
+   and rss is printed at the end of each simulated day. the cars on the
+   road change: each day half of them are new plates, never seen before,
+   so memory that grows with every plate ever seen shows up. each
+   horizon runs in a fresh process so its rss is its own.
+
+   usage: python bench_soak.py [readings per day] [horizon seconds, 0 = keep]
+          [days]
+"""
+import gc
+from heapq import heappop, heappush
+import random
+import subprocess
+import sys
+import time
+
+from main import rss
+from observe import DAY, Observations
+
+
+PLATES = 200_000  # cars on the road on any one day
+
+
+def readings(days, per_day, rand, miles):
+    """readings in arrival order: each reaches the server up to five
+       minutes after its timestamp, so they arrive a little out of order"""
+    pending = []  # heap of (arrival, timestamp, plate, road, mile, limit)
+    step = DAY * len(miles[0]) / per_day  # mean seconds between trips
+    clock = 0
+    while clock < days * DAY:
+        # plates of the day before and the day's new ones, half each
+        plate = b"%08X" % (int(clock // DAY) * PLATES // 2
+                           + rand.randrange(PLATES))
+        road = rand.randrange(len(miles))
+        speed = rand.uniform(40, 80)  # mph
+        clock += rand.expovariate(1 / step)
+        for mile in miles[road]:
+            timestamp = int(clock + mile / speed * 3600)
+            heappush(pending, (timestamp + rand.randrange(300), timestamp,
+                               plate, road, mile, 60))
+        while pending[0][0] <= clock:
+            _, timestamp, plate, road, mile, limit = heappop(pending)
+            yield plate, road, mile, timestamp, limit
+
+
+def report(day, observations):
+    gc.collect()
+    print(f"  day {day}: rss {rss() >> 20:5}MB  {observations}")
+
+
+def soak(per_day, horizon, days=7):
+    rand = random.Random(17)
+    miles = [sorted(rand.sample(range(1, 100), 8)) for _ in range(100)]
+    observations = Observations(horizon or None)
+    add = observations.add
+    print(f"horizon {horizon or 'none'}: start rss {rss() >> 20}MB")
+    start = time.perf_counter()
+    count = tickets = 0
+    day = 1
+    for reading in readings(days, per_day, rand, miles):
+        if reading[3] >= day * DAY:
+            report(day, observations)
+            day += 1
+        tickets += len(add(*reading))
+        count += 1
+    report(day, observations)
+    elapsed = time.perf_counter() - start
+    print(f"  {count / elapsed:,.0f} readings/s, {tickets:,} tickets")
+
+
+if __name__ == "__main__":
+    per_day = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    days = int(sys.argv[3]) if len(sys.argv) > 3 else 7
+    if len(sys.argv) > 2:
+        soak(per_day, int(sys.argv[2]), days)
+    else:
+        for horizon in (DAY, 0):
+            subprocess.run([sys.executable, __file__, str(per_day),
+                            str(horizon), str(days)], check=True)
@@ -0,0 +1,180 @@
+import asyncio
+from collections import defaultdict, deque
+from struct import unpack
+
+try:
+    from fcntl import ioctl
+    from termios import TIOCOUTQ  # SIOCOUTQ: bytes the peer hasn't acked
+except ImportError:
+    ioctl = None
+
+PRUNE_INTERVAL = 0.1  # seconds between looks at what the peer acknowledged
+
+
+class Recipient:
+    """one connected dispatcher and its unacknowledged tickets
+
+       tickets written to the transport stay in inflight (with the byte
+       offset they end at) until everything up to that offset is seen to
+       be acknowledged: out of the transport's buffer and, where the
+       kernel tells (SIOCOUTQ), out of the socket's send queue too. that
+       is looked at on every send and drain, and every PRUNE_INTERVAL
+       while tickets are in flight, so that a connection reset (which
+       empties the buffer and the send queue) finds little more than the
+       truly unacknowledged tickets left. when the buffer is over its
+       high-water mark the recipient is not ready, and takes no tickets
+       until drained.
+    """
+
+    __slots__ = ("writer", "roads", "inflight", "written", "ready",
+                 "closed", "pruning")
+
+    def __init__(self, writer, roads):
+        self.writer = writer
+        self.roads = roads
+        self.inflight = deque()  # (end offset, road, ticket)
+        self.written = 0
+        self.ready = True
+        self.closed = False
+        self.pruning = None  # TimerHandle of the next prune
+
+    def load(self):
+        return self.writer.transport.get_write_buffer_size()
+
+    def unacked(self):
+        """bytes written but not yet acknowledged by the peer (or, without
+           SIOCOUTQ, not yet handed to the socket)"""
+        pending = self.load()
+        if ioctl and (sock := self.writer.get_extra_info("socket")):
+            try:
+                pending += unpack("i", ioctl(sock.fileno(), TIOCOUTQ,
+                                             bytes(4)))[0]
+            except OSError:
+                pass
+        return pending
+
+    def acknowledge(self):
+        """forget tickets known to have reached the peer; bytes still
+           queued (other writes included) count as unacknowledged"""
+        if self.writer.is_closing():
+            return  # a closed transport discards its buffer: keep all
+        flushed = self.written - self.unacked()
+        inflight = self.inflight
+        while inflight and inflight[0][0] <= flushed:
+            inflight.popleft()
+        if inflight and self.pruning is None and not self.closed:
+            self.pruning = asyncio.get_running_loop().call_later(
+                PRUNE_INTERVAL, self.prune)
+
+    def prune(self):
+        self.pruning = None
+        if not self.closed:
+            self.acknowledge()
+
+    def close(self):
+        self.closed = True
+        if self.pruning:
+            self.pruning.cancel()
+            self.pruning = None
+
+    def send(self, road, ticket):
+        self.writer.write(ticket)
+        self.written += len(ticket)
+        self.inflight.append((self.written, road, ticket))
+        self.acknowledge()
+        _, high = self.writer.transport.get_write_buffer_limits()
+        return self.load() <= high
+
+
+class Dispatch:
+    """tickets held per road until a live dispatcher for the road takes one
+
+       each ticket goes to the ready dispatcher with the least buffered
+       output, taking turns among equals. a dispatcher over its
+       high-water mark stops taking tickets until its writer drains.
+       when a dispatcher leaves, the tickets it hadn't acknowledged go
+       back to the front of their roads' pending queues for the others.
+       those acknowledged since the last look (at most PRUNE_INTERVAL
+       ago) go back too, so a ticket can still, rarely, be sent twice.
+    """
+
+    def __init__(self):
+        self.pending = defaultdict(deque)  # road -> deque(ticket)
+        self.recipients = defaultdict(list)  # road -> [Recipient]
+        self.by_writer = {}
+        self.turn = defaultdict(int)  # road -> next index to try first
+        self.stats = dict(sent=0, requeued=0, paused=0)
+
+    def __str__(self):
+        stats = " ".join(f"{key}={val}" for key, val in self.stats.items())
+        return (f"{stats} pending={sum(map(len, self.pending.values()))}"
+                f" dispatchers={len(self.by_writer)}")
+
+    def submit(self, road, ticket):
+        self.pending[road].append(ticket)
+        self.pump(road)
+
+    def add(self, writer, roads):
+        roads = set(roads)
+        recipient = self.by_writer[writer] = Recipient(writer, roads)
+        for road in roads:
+            self.recipients[road].append(recipient)
+        self.pump_all(roads)
+
+    def remove(self, writer):
+        if not (recipient := self.by_writer.pop(writer, None)):
+            return
+        recipient.close()
+        for road in recipient.roads:
+            if recipient in (recipients := self.recipients[road]):
+                recipients.remove(recipient)
+            if not recipients:
+                del self.recipients[road]
+        recipient.acknowledge()
+        for _, road, ticket in reversed(recipient.inflight):
+            self.pending[road].appendleft(ticket)
+        self.stats["requeued"] += len(recipient.inflight)
+        self.pump_all({road for _, road, _ in recipient.inflight})
+
+    def pick(self, road):
+        recipients = self.recipients.get(road)
+        if not recipients:
+            return None
+        count = len(recipients)
+        start = self.turn[road] % count
+        best = best_load = None
+        for i in range(start, start + count):
+            recipient = recipients[i % count]
+            if recipient.ready and not recipient.writer.is_closing():
+                load = recipient.load()
+                if best is None or load < best_load:
+                    best, best_load, self.turn[road] = recipient, load, i + 1
+                    if not load:
+                        break  # nothing buffered: can't do better
+        return best
+
+    def pump(self, road):
+        pending = self.pending[road]
+        while pending and (recipient := self.pick(road)):
+            self.stats["sent"] += 1
+            if not recipient.send(road, pending.popleft()):
+                recipient.ready = False
+                self.stats["paused"] += 1
+                asyncio.create_task(self.drain(recipient))
+        if not pending:
+            del self.pending[road]
+
+    def pump_all(self, roads):
+        for road in roads:
+            if road in self.pending:
+                self.pump(road)
+
+    async def drain(self, recipient):
+        try:
+            await recipient.writer.drain()
+        except ConnectionError:
+            return  # on_connect sees it too, and removes the dispatcher
+        if not recipient.closed:
+            recipient.ready = True
+            recipient.acknowledge()
+            self.pump_all(recipient.roads)
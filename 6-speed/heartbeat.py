@@ -0,0 +1,72 @@
+import asyncio
+
+from protocol import HEARTBEAT_FRAME
+
+
+class HeartbeatWheel:
+    """every client's heartbeats driven from one hashed timer wheel
+
+       a client sits in the slot of its next deadline (with the number of
+       full turns still to wait); one task wakes each tick, writes the
+       heartbeats due in that slot and moves those clients to their next
+       slot. the task only runs while there are clients to serve.
+       remove() forgets a writer at once, without waiting for its next
+       deadline to notice it closing.
+    """
+
+    def __init__(self, tick=0.1, size=1024):
+        self.tick = tick
+        self.slots = [{} for _ in range(size)]  # writer -> [ticks, turns]
+        self.where = {}  # writer -> slot index
+        self.now = 0  # ticks since the wheel first started
+        self.task = None
+        self.sent = 0
+
+    def __len__(self):
+        return len(self.where)
+
+    def add(self, writer, interval):
+        """send writer a heartbeat every interval seconds"""
+        self.schedule(writer, max(1, round(interval / self.tick)))
+        if not self.task:
+            self.task = asyncio.create_task(self.run())
+
+    def remove(self, writer):
+        if (slot := self.where.pop(writer, None)) is not None:
+            del self.slots[slot][writer]
+
+    def schedule(self, writer, ticks):
+        size = len(self.slots)
+        slot = (self.now + ticks) % size
+        self.slots[slot][writer] = [ticks, (ticks - 1) // size]
+        self.where[writer] = slot
+
+    def advance(self):
+        self.now += 1
+        slot = self.slots[self.now % len(self.slots)]
+        due = []
+        for writer, entry in slot.items():
+            if entry[1]:
+                entry[1] -= 1
+            else:
+                due.append(writer)
+        for writer in due:
+            ticks = slot.pop(writer)[0]
+            if writer.is_closing():
+                del self.where[writer]
+                continue
+            writer.write(HEARTBEAT_FRAME)
+            self.schedule(writer, ticks)
+        self.sent += len(due)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time() - self.now * self.tick
+        try:
+            while self.where:
+                await asyncio.sleep(
+                    start + (self.now + 1) * self.tick - loop.time())
+                while start + (self.now + 1) * self.tick <= loop.time():
+                    self.advance()  # catch up on ticks missed while busy
+        finally:
+            self.task = None
@@ -0,0 +1,135 @@
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+
+DAY = 86400
+NO_DAYS = frozenset()
+
+
+class Track:
+    """one plate's readings on one road, as parallel typed arrays sorted
+       by (timestamp, mile): 6 bytes per reading"""
+
+    __slots__ = ("timestamps", "miles")
+
+    def __init__(self):
+        self.timestamps = array("I")
+        self.miles = array("H")
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def insert(self, timestamp, mile):
+        timestamps, miles = self.timestamps, self.miles
+        pos = bisect_left(timestamps, timestamp)
+        while (pos < len(timestamps) and timestamps[pos] == timestamp
+               and miles[pos] < mile):
+            pos += 1
+        timestamps.insert(pos, timestamp)
+        miles.insert(pos, mile)
+        return pos
+
+    def drop_before(self, timestamp):
+        """remove readings older than timestamp, returning how many"""
+        pos = bisect_left(self.timestamps, timestamp)
+        del self.timestamps[:pos], self.miles[:pos]
+        return pos
+
+
+class Observations:
+    """plate readings indexed by (plate, road), each track sorted by time
+
+       a new reading only changes the adjacent pairs around its sorted
+       position, so only its immediate neighbours are checked. every
+       other pair was already checked when it became adjacent, and could
+       only have been ticketed then (limits are per road, and a plate's
+       ticketed days only grow).
+
+       with a horizon (seconds), memory stays bounded: the (plate, road)
+       keys seen each day are kept in day buckets, and once a whole day
+       falls more than horizon behind the newest reading, its readings
+       and ticketed days are evicted. a reading arriving for a day already
+       evicted (counted as late) is still checked, then goes into its own
+       day's bucket like any other, so the next eviction drops it again;
+       nothing is remembered per plate, which would grow with every plate
+       ever seen. its ticket can repeat a day ticketed before eviction.
+    """
+
+    def __init__(self, horizon=None):
+        self.tracks = {}  # (plate, road) -> Track
+        self.days_by_plate = {}  # plate -> set(day numbers of tickets)
+        self.horizon = horizon
+        self.buckets = defaultdict(set)  # day -> {(plate, road), ...}
+        self.newest = 0  # latest timestamp seen
+        self.floor = 0  # start of the oldest day kept
+        self.count = 0
+        self.late = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return self.count
+
+    def __str__(self):
+        return (f"readings={self.count} tracks={len(self.tracks)}"
+                f" days={len(self.buckets)} ticketed={len(self.days_by_plate)}"
+                f" evicted={self.evicted} late={self.late}")
+
+    def add(self, plate, road, mile, timestamp, limit):
+        """record a reading and return the tickets it produces, as
+           (plate, road, mile1, timestamp1, mile2, timestamp2, speed*100)"""
+        key = plate, road
+        if not (track := self.tracks.get(key)):
+            track = self.tracks[key] = Track()
+        pos = track.insert(timestamp, mile)
+        self.count += 1
+
+        tickets = []
+        timestamps, miles = track.timestamps, track.miles
+        if pos > 0:
+            self.check(plate, road, miles[pos - 1], timestamps[pos - 1],
+                       mile, timestamp, limit, tickets)
+        if pos + 1 < len(timestamps):
+            self.check(plate, road, mile, timestamp,
+                       miles[pos + 1], timestamps[pos + 1], limit, tickets)
+
+        if self.horizon is not None:
+            self.buckets[timestamp // DAY].add(key)
+            if timestamp < self.floor:
+                self.late += 1
+            if timestamp > self.newest:
+                self.newest = timestamp
+                if timestamp - self.horizon >= self.floor + DAY:
+                    self.evict()
+        return tickets
+
+    def check(self, plate, road, m1, t1, m2, t2, limit, tickets):
+        if t1 == t2:
+            return  # no duration, no speed
+        ticket_days = self.days_by_plate.get(plate, NO_DAYS)
+        days = {t1 // DAY, t2 // DAY}
+        if ticket_days.isdisjoint(days):
+            speed = abs(m1 - m2) / ((t2 - t1) / 60 / 60)
+            if speed > limit:
+                tickets.append((plate, road, m1, t1, m2, t2,
+                                int(speed * 100)))
+                self.days_by_plate.setdefault(plate, set()).update(days)
+
+    def evict(self):
+        """drop every day that ended more than horizon before the newest
+           reading"""
+        first = (self.newest - self.horizon) // DAY  # oldest day kept
+        self.floor = floor = first * DAY
+        tracks, days_by_plate = self.tracks, self.days_by_plate
+        for day in [day for day in self.buckets if day < first]:
+            for key in self.buckets.pop(day):
+                if track := tracks.get(key):
+                    dropped = track.drop_before(floor)
+                    self.count -= dropped
+                    self.evicted += dropped
+                    if not track:
+                        del tracks[key]
+                if ticket_days := days_by_plate.get(key[0]):
+                    ticket_days.discard(day)
+                    if not ticket_days:
+                        del days_by_plate[key[0]]
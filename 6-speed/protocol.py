@@ -0,0 +1,95 @@
+from collections import namedtuple
+from struct import Struct, unpack_from
+
+
+ERROR = 0x10
+PLATE = 0x20
+TICKET = 0x21
+WANT_HEARTBEAT = 0x40
+HEARTBEAT = 0x41
+CAMERA = 0x80
+DISPATCHER = 0x81
+
+
+Plate = namedtuple("Plate", "plate timestamp")  # plate is bytes
+WantHeartbeat = namedtuple("WantHeartbeat", "interval")
+Camera = namedtuple("Camera", "road mile limit")
+Dispatcher = namedtuple("Dispatcher", "roads")
+Illegal = namedtuple("Illegal", "kind")  # unknown type: parsing stops
+
+u16 = Struct("!H")
+u32 = Struct("!L")
+camera = Struct("!HHH")
+head = Struct("!BB")  # type and string length
+ticket_tail = Struct("!HHLHLH")
+
+HEARTBEAT_FRAME = bytes((HEARTBEAT,))
+
+
+class Parser:
+    """incremental decoder for client messages
+
+       feed appends received bytes and returns every message they
+       complete, decoded in place with unpack_from on a memoryview; a
+       partial frame stays buffered until the rest arrives. an unknown
+       type ends the list with an Illegal message, since nothing after
+       it can be framed.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.failed = False
+
+    def feed(self, data):
+        buffer = self.buffer
+        buffer += data
+        end = len(buffer)
+        messages = []
+        append = messages.append
+        pos = 0
+        with memoryview(buffer) as view:
+            while pos < end and not self.failed:
+                kind = view[pos]
+                if kind == PLATE:
+                    if pos + 2 > end:
+                        break
+                    stop = pos + 2 + view[pos + 1]
+                    if stop + 4 > end:
+                        break
+                    append(Plate(bytes(view[pos + 2:stop]),
+                                 u32.unpack_from(view, stop)[0]))
+                    pos = stop + 4
+                elif kind == CAMERA:
+                    if pos + 7 > end:
+                        break
+                    append(Camera(*camera.unpack_from(view, pos + 1)))
+                    pos += 7
+                elif kind == WANT_HEARTBEAT:
+                    if pos + 5 > end:
+                        break
+                    append(WantHeartbeat(u32.unpack_from(view, pos + 1)[0]))
+                    pos += 5
+                elif kind == DISPATCHER:
+                    if pos + 2 > end:
+                        break
+                    count = view[pos + 1]
+                    if pos + 2 + count * 2 > end:
+                        break
+                    append(Dispatcher(
+                        unpack_from(f"!{count}H", view, pos + 2)))
+                    pos += 2 + count * 2
+                else:
+                    append(Illegal(kind))
+                    self.failed = True
+        del buffer[:pos]
+        return messages
+
+
+def encode_ticket(plate, road, mile1, timestamp1, mile2, timestamp2, speed):
+    return b"".join((head.pack(TICKET, len(plate)), plate, ticket_tail.pack(
+        road, mile1, timestamp1, mile2, timestamp2, speed)))
+
+
+def encode_error(message):
+    message = message.encode()[:255]
+    return head.pack(ERROR, len(message)) + message
@@ -0,0 +1,123 @@
+"""LRCP parsing: fuzz equivalence and datagrams/second, regexes vs parse
+
+   the regex pipeline the server used (outer match, data match, the
+   unescaped-slash search and the chained replaces, int() for acks) is
+   reproduced as legacy_parse. random and mutated well-formed ascii
+   datagrams must give the same result from both; then both parse a
+   mix of data and ack datagrams.
+
+   usage: python bench_parse.py [fuzz cases] [datagrams]
+"""
+import random
+import re
+import sys
+import time
+
+from lrcp import Message, parse
+
+
+def legacy_parse(datagram):
+    message = datagram.decode()
+    if not (match := re.match(r"/([^/]+?)/(\d+?)/(?:(.*)/)?", message,
+                              flags=re.MULTILINE | re.DOTALL)):
+        return None
+    kind, session, rest = match.groups()
+    if (session := int(session)) <= 0:
+        return None
+    if rest is None:
+        return Message(kind, session, False, None, None)
+    pos = data = None
+    if kind == "data":
+        if match := re.match(r"(\d+?)/(.*)", rest,
+                             flags=re.MULTILINE | re.DOTALL):
+            pos, data = int(match[1]), match[2]
+            if re.search(r"(?<!\\)/", data):
+                data = None
+            else:
+                data = data.replace(r"\\", "\\").replace(r"\/", "/")
+    elif kind == "ack":
+        try:
+            if (pos := int(rest)) < 0:
+                pos = None
+        except ValueError:
+            pass
+    return Message(kind, session, True, pos, data)
+
+
+def decoded(message):
+    if message is None:
+        return None
+    return message._replace(
+        kind=message.kind.decode(),
+        data=None if message.data is None else message.data.decode())
+
+
+PIECES = ["/", "/", "/", "\\", "\\", "\\/", "\\\\", "0", "1", "7", "42",
+          "data", "ack", "connect", "close", "x", " ", "\n", "-", "+", "_"]
+
+
+def fuzz_case(rand):
+    if rand.random() < 0.3:
+        return "".join(rand.choices(PIECES, k=rand.randrange(12)))
+    kind = rand.choice(["data", "ack", "connect", "close", "x"])
+    fields = [kind, str(rand.randrange(-1, 3))]
+    if kind == "data":
+        fields.append(str(rand.randrange(3)))
+        fields.append("".join(rand.choices(PIECES[3:], k=rand.randrange(6))))
+    elif kind == "ack":
+        fields.append(rand.choice(["0", "12", "-1", " 3", "1_0", "+2", ""]))
+    message = list("/" + "/".join(fields) + "/")
+    for _ in range(rand.randrange(3)):  # mutate
+        at = rand.randrange(len(message) + 1)
+        if rand.random() < 0.5 and at < len(message):
+            del message[at]
+        else:
+            message.insert(at, rand.choice(PIECES))
+    return "".join(message)
+
+
+def fuzz(count, seed=19):
+    rand = random.Random(seed)
+    accepted = 0
+    for _ in range(count):
+        datagram = fuzz_case(rand).encode()
+        expected = legacy_parse(datagram)
+        assert decoded(parse(datagram)) == expected, datagram
+        accepted += expected is not None
+    return accepted
+
+
+def workload(count, seed=19):
+    rand = random.Random(seed)
+    datagrams = []
+    for i in range(count):
+        if i % 2:
+            datagrams.append(b"/ack/%d/%d/" % (rand.randrange(1, 2 ** 31), i))
+            continue
+        line = bytes(rand.choices(b"abcdefghij klmnop\n", k=400))
+        if i % 10 == 0:
+            line = line.replace(b"k", b"\\/")  # some escapes
+        datagrams.append(b"/data/%d/%d/%s/" % (rand.randrange(1, 2 ** 31), i,
+                                                line))
+    return datagrams
+
+
+def throughput(parser, datagrams):
+    start = time.perf_counter()
+    for datagram in datagrams:
+        parser(datagram)
+    return len(datagrams) / (time.perf_counter() - start)
+
+
+def main(cases, count):
+    accepted = fuzz(cases)
+    print(f"fuzz: {cases:,} datagrams ({accepted:,} accepted), identical")
+    datagrams = workload(count)
+    for name, parser in (("regexes", legacy_parse), ("parse", parse)):
+        print(f"{name:>7}: {throughput(parser, datagrams):10,.0f}"
+              f" datagrams/s")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [200_000, 500_000][len(args):]))
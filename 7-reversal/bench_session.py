@@ -0,0 +1,123 @@
+"""one session's buffers streaming a lot of data: str buffers vs bytearray
+
+   the client's data arrives in 900 byte datagrams holding mostly short
+   lines plus the odd long one; each complete line is reversed into the
+   write buffer, and the client acknowledges output 64 datagrams late.
+   only the buffers are exercised (no sockets or retransmission),
+   though the bytearray write buffer also cuts its output into data
+   messages, which the str one left to sending.
+
+   the str buffers copy everything buffered on each datagram, line and
+   ack, so their cost per byte grows with the longest line; they stream
+   16MB per line length, the bytearray buffers the full size.
+
+   usage: python bench_session.py [megabytes]
+"""
+import asyncio
+import random
+import sys
+import time
+
+from main import ReadBuffer, WriteBuffer
+
+
+class LegacyReadBuffer:
+
+    def __init__(self):
+        self.buffer = ""
+        self.length = 0
+
+    def add(self, pos, data):
+        append = data[self.length - pos:]
+        self.buffer += append
+        self.length += len(append)
+        return len(append) > 0
+
+    def readline(self):
+        line = None
+        if 0 <= (end := self.buffer.find("\n")):
+            line, self.buffer = self.buffer[:end], self.buffer[end + 1:]
+        return line
+
+
+class LegacyWriteBuffer:
+    """the old buffering only (sending left out)"""
+
+    def send_all(self):
+        pass
+
+    def __init__(self):
+        self.buffer = ""
+        self.length = 0
+        self.acked = 0
+
+    def add(self, line):
+        self.buffer += line + "\n"
+        self.length += len(line) + 1
+
+    def ack(self, pos):
+        if pos <= self.acked:
+            pass
+        elif pos == self.length:
+            self.acked = pos
+            self.buffer = ""
+        elif pos < self.length:
+            self.buffer = self.buffer[pos - self.acked:]
+            self.acked = pos
+
+
+def stream(megabytes, longest, seed=20):
+    """lines of up to 80 bytes, with a line of up to longest bytes making
+       up about half the data"""
+    rand = random.Random(seed)
+    lines = []
+    size = 0
+    while size < megabytes << 20:
+        length = (rand.randrange(longest) if rand.random() < 80 / longest
+                  else rand.randrange(80))
+        lines.append(b"x" * length + b"\n")
+        size += length + 1
+    return b"".join(lines)
+
+
+def run(reader, writer, data, as_text):
+    pending = []  # write offsets the client has yet to acknowledge
+    for pos in range(0, len(data), 900):
+        chunk = data[pos:pos + 900]
+        reader.add(pos, chunk.decode() if as_text else chunk)
+        while line := reader.readline():
+            writer.add(line[::-1])
+        writer.send_all()
+        pending.append(writer.length)
+        if len(pending) > 64:
+            writer.ack(pending.pop(0))
+    return writer.length
+
+
+class QuietWriteBuffer(WriteBuffer):
+    """sends all it has to nowhere, with no retransmission"""
+
+    def __init__(self):
+        super().__init__(lambda message: None, 1, lambda when: None,
+                         window=float("inf"))
+
+
+def measure(name, reader, writer, megabytes, longest, as_text=False):
+    data = stream(megabytes, longest)
+    start = time.perf_counter()
+    run(reader, writer, data, as_text)
+    elapsed = time.perf_counter() - start
+    print(f"{name:>9}, lines up to {longest >> 10:5}kB, {megabytes:3}MB:"
+          f" {elapsed:6.2f}s {megabytes / elapsed:7.1f} MB/s")
+
+
+async def main(megabytes):  # send_all wants the loop's time
+    for longest in (64 << 10, 1 << 20, 8 << 20):
+        measure("str", LegacyReadBuffer(), LegacyWriteBuffer(),
+                min(megabytes, 16), longest, as_text=True)
+        measure("bytearray", ReadBuffer(), QuietWriteBuffer(),
+                megabytes, longest)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100))
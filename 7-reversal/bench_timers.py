@@ -0,0 +1,106 @@
+"""packet handling with 10k concurrent sessions: timer tasks vs TimerWheel
+
+   sessions talk to an in-memory server socket. each packet is either a
+   line of data for a random session (sending the reversed line and
+   arming retransmission) or an ack of everything that session sent,
+   and each resets the session's expiry, as the receive loop does. the
+   old timers are a task per expiry reset and per send. reports packets
+   per second, cpu share while idle afterwards (retransmits pending),
+   and how many tasks or filed timers are alive.
+
+   usage: python bench_timers.py [sessions] [packets]
+"""
+import asyncio
+import random
+import sys
+import time
+
+import main
+from main import RETRANSMISSION_TIMEOUT, SESSION_TIMEOUT, Session, WriteBuffer
+
+
+class Server:
+    """stands in for the udp socket"""
+
+    def sendto(self, message, address):
+        pass
+
+
+class LegacyWriteBuffer(WriteBuffer):
+    """a send task per new line, cancelling the previous one"""
+
+    sending = None
+
+    def send_all(self):
+        if self.sending:
+            self.sending.cancel()
+        self.sending = asyncio.create_task(self.send_chunked())
+
+    async def send_chunked(self):
+        while self.session_id in main.sessions and self.length > self.acked:
+            super().send_all()
+            await asyncio.sleep(RETRANSMISSION_TIMEOUT)
+
+
+class LegacySession(Session):
+    """a new expiry task on every packet, cancelling the previous one"""
+
+    def __init__(self, id, server, address):
+        super().__init__(id, server, address)
+        self.writer = LegacyWriteBuffer(self.send, id, lambda when: None)
+        self.expiry = None
+
+    async def inactivity_timer(self):
+        await asyncio.sleep(SESSION_TIMEOUT)
+        del main.sessions[self.id]
+
+    def reset_expiry(self):
+        if self.expiry:
+            self.expiry.cancel()
+        self.expiry = asyncio.create_task(self.inactivity_timer())
+
+
+async def run(kind, count, packets):
+    main.sessions.clear()
+    main.timers = main.TimerWheel()
+    server = Server()
+    sessions = []
+    for id in range(1, count + 1):
+        session = main.sessions[id] = kind(id, server, ("127.0.0.1", id))
+        session.reset_expiry()
+        sessions.append(session)
+    rand = random.Random(21)
+    picks = [rand.choice(sessions) for _ in range(packets)]
+
+    start = time.perf_counter()
+    for i, session in enumerate(picks):
+        if i % 2:
+            session.ack(session.writer.sent)
+        else:
+            session.handle(session.reader.length, b"hello world\n")
+        session.reset_expiry()
+        if i % 1000 == 999:
+            await asyncio.sleep(0)  # let the loop run, as between reads
+    rate = packets / (time.perf_counter() - start)
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    await asyncio.sleep(RETRANSMISSION_TIMEOUT * 2)
+    idle = (time.process_time() - cpu) / (time.perf_counter() - wall)
+    tasks = len(asyncio.all_tasks()) - 1
+    main.sessions.clear()
+    for task in asyncio.all_tasks() - {asyncio.current_task()}:
+        task.cancel()
+    return rate, idle, tasks, len(main.timers)
+
+
+async def bench(count, packets):
+    for name, kind in (("tasks", LegacySession), ("TimerWheel", Session)):
+        rate, idle, tasks, filed = await run(kind, count, packets)
+        print(f"{name:>10}: {rate:9,.0f} packets/s, idle cpu {idle:5.1%},"
+              f" {tasks:,} tasks, {filed:,} filed timers")
+        await asyncio.sleep(0.1)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(bench(*(args + [10_000, 500_000][len(args):])))
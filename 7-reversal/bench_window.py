@@ -0,0 +1,203 @@
+"""one session over lossy local udp: resend-everything vs sliding window
+
+   the server runs in this process on 127.0.0.1 and a client uploads
+   lines through LRCP and reads back the reversed lines. the client
+   drops a share of the data it receives and of the acks it sends for
+   it, as a lossy link would; the upload is not measured and not lost.
+   the old WriteBuffer sends all unacknowledged output, in 500 byte
+   pieces, on every new line, partial ack and timeout. the
+   retransmission timeout is 0.3s here, a LAN's worth.
+
+   reports the time to get all the output back, goodput, and redundant
+   bytes: data payload that reached the client's socket beyond the
+   output itself.
+
+   usage: python bench_window.py [kilobytes] [loss %]...
+"""
+import asyncio
+import random
+import socket
+import sys
+import time
+
+import main
+from lrcp import escape, parse
+from main import WriteBuffer
+
+ports = iter(range(23412, 24000))  # a fresh one per run
+SESSION = 2022
+
+
+class LegacyWriteBuffer:
+    """the old sending (with the escaping fixed, as that is not compared)"""
+
+    def __init__(self, writer, session_id, wake):
+        self.writer = writer
+        self.session_id = session_id
+        self.wake = wake
+        self.buffer = bytearray()
+        self.length = 0
+        self.acked = 0
+        self.retransmit_at = None
+
+    def add(self, line):
+        self.buffer += line
+        self.buffer += b"\n"
+        self.length += len(line) + 1
+
+    def send_all(self):
+        self.send_unacked()
+        self.retransmit_at = (asyncio.get_running_loop().time()
+                              + main.RETRANSMISSION_TIMEOUT)
+        self.wake(self.retransmit_at)
+
+    def retransmit(self, now):
+        if self.length > self.acked:
+            self.send_unacked()
+            self.retransmit_at = now + main.RETRANSMISSION_TIMEOUT
+        else:
+            self.retransmit_at = None
+
+    def send_unacked(self):
+        buffer, sent = self.buffer, self.acked
+        for beg in range(0, len(buffer), 500):
+            part = buffer[beg:beg + 500]
+            self.writer(b"/data/%d/%d/%s/" % (self.session_id, sent,
+                                              escape(part)))
+            sent += len(part)
+
+    def ack(self, pos):
+        if pos <= self.acked:
+            pass
+        elif pos == self.length:
+            self.acked = pos
+            del self.buffer[:]
+        elif pos > self.length:
+            self.writer(b"/close/%d/" % self.session_id)
+            del main.sessions[self.session_id]
+        elif pos < self.length:
+            del self.buffer[:pos - self.acked]
+            self.acked = pos
+            self.send_all()
+
+
+class Client:
+
+    def __init__(self, port, lines, loss, seed=22):
+        self.upload = b"".join(lines)
+        self.expected = b"".join(line[-2::-1] + b"\n" for line in lines)
+        self.loss = loss
+        self.rand = random.Random(seed)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.sock.connect(("127.0.0.1", port))
+        self.received = bytearray()
+        self.uploaded = 0  # acked by the server
+        self.progress = asyncio.Event()
+        self.wire = 0  # data payload bytes that arrived
+
+    def lost(self):
+        return self.rand.random() < self.loss
+
+    def send(self, message):
+        if not self.lost():
+            self.sock.send(message)
+
+    async def receive(self):
+        loop = asyncio.get_running_loop()
+        while len(self.received) < len(self.expected):
+            datagram = await loop.sock_recv(self.sock, 2000)
+            if (message := parse(datagram)) is None:
+                continue
+            kind, _, _, pos, data = message
+            if kind == b"ack":
+                if pos > self.uploaded:
+                    self.uploaded = pos
+                    self.progress.set()
+            elif kind == b"data":
+                self.wire += len(data)
+                if self.lost():
+                    continue
+                if pos <= len(self.received):
+                    self.received += data[len(self.received) - pos:]
+                self.send(b"/ack/%d/%d/" % (SESSION, len(self.received)))
+
+    async def send_upload(self, window=16384, timeout=0.3):
+        """the input, without loss (not measured)"""
+        sent = 0
+        while self.uploaded < len(self.upload):
+            end = min(self.uploaded + window, len(self.upload))
+            for beg in range(sent, end, 900):
+                part = self.upload[beg:min(beg + 900, end)]
+                self.sock.send(b"/data/%d/%d/%s/" % (SESSION, beg, part))
+            sent = max(sent, end)
+            self.progress.clear()
+            try:
+                await asyncio.wait_for(self.progress.wait(), timeout)
+            except asyncio.TimeoutError:
+                sent = self.uploaded  # go back
+
+    async def run(self, limit):
+        self.sock.send(b"/connect/%d/" % SESSION)
+        start = time.perf_counter()
+        receiving = asyncio.create_task(self.receive())
+        uploading = asyncio.create_task(self.send_upload())
+        try:
+            await asyncio.wait_for(receiving, limit)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            uploading.cancel()
+            self.sock.send(b"/close/%d/" % SESSION)
+            self.sock.close()
+        assert self.received == self.expected
+        return time.perf_counter() - start
+
+
+def make_lines(kilobytes, seed=22):
+    rand = random.Random(seed)
+    lines, size = [], 0
+    while size < kilobytes << 10:
+        lines.append(bytes(rand.choices(b"abcdefghij klmnop",
+                                        k=rand.randrange(1, 80))) + b"\n")
+        size += len(lines[-1])
+    return lines
+
+
+async def run(kind, lines, loss, limit=60):
+    main.WriteBuffer = kind
+    main.sessions.clear()
+    main.timers = main.TimerWheel()
+    port = next(ports)
+    server = asyncio.create_task(main.main("127.0.0.1", port))
+    await asyncio.sleep(0.1)
+    client = Client(port, lines, loss)
+    elapsed = await client.run(limit)
+    server.cancel()
+    await asyncio.sleep(0.1)
+    return elapsed, client
+
+
+async def bench(kilobytes, losses):
+    main.RETRANSMISSION_TIMEOUT = 0.3
+    main.MAX_RETRANSMISSION_TIMEOUT = 2.4
+    main.print = lambda *args: None  # no session chatter
+    lines = make_lines(kilobytes)
+    for loss in losses:
+        for name, kind in (("resend all", LegacyWriteBuffer),
+                           ("window", WriteBuffer)):
+            elapsed, client = await run(kind, lines, loss / 100)
+            size = len(client.expected)
+            if elapsed is None:
+                print(f"{loss:3}% loss, {name:>10}: unfinished after 60s,"
+                      f" {client.wire / size:6.1f}x the output sent")
+                continue
+            print(f"{loss:3}% loss, {name:>10}: {elapsed:6.2f}s"
+                  f" {size / elapsed / 1024:8.1f} kB/s goodput,"
+                  f" {client.wire - size:12,} redundant bytes"
+                  f" ({(client.wire - size) / size:6.1%})")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(bench(args[0] if args else 1024, args[1:] or [0, 2, 10]))
@@ -0,0 +1,114 @@
+"""LRCP datagrams/second and line latency: one process vs N workers
+
+   the server runs in a child process (output discarded), as WORKERS
+   SO_REUSEPORT workers or in one process. each client has its own
+   socket (so its own source port to be hashed) and session, and sends
+   a line, waits for it to come back reversed, acks it and sends the
+   next. the rate counts the four datagrams of each round (data, ack,
+   reversed data, ack); latency is from sending a line to getting it
+   back reversed (a line is sent again if nothing comes back within a
+   second). the load generator is one asyncio process, so on small
+   machines it can be the limit rather than the server.
+
+   usage: python bench_workers.py [clients] [seconds]
+"""
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+import main
+from lrcp import parse
+
+
+def serve(workers, port):
+    sys.stdout = sys.stderr = open(os.devnull, "w")
+    if workers:
+        main.run("127.0.0.1", port, workers)
+    else:
+        asyncio.run(main.main("127.0.0.1", port))
+
+
+class Client(asyncio.DatagramProtocol):
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    def datagram_received(self, data, address):
+        self.queue.put_nowait(data)
+
+    async def expect(self, kind, pos=0):
+        """the next message of kind for pos, skipping stale resends"""
+        while True:
+            message = parse(await self.queue.get())
+            if message.kind == kind and message.pos == pos:
+                return message
+
+
+async def session(port, id, deadline, latencies, resends):
+    loop = asyncio.get_running_loop()
+    transport, client = await loop.create_datagram_endpoint(
+        Client, remote_addr=("127.0.0.1", port))
+    try:
+        while True:  # the server may not be listening yet
+            transport.sendto(b"/connect/%d/" % id)
+            try:
+                await asyncio.wait_for(client.expect(b"ack"), 0.2)
+                break
+            except asyncio.TimeoutError:
+                pass
+        pos = 0
+        while time.perf_counter() < deadline:
+            line = b"line %d from session %d\n" % (pos, id)
+            start = time.perf_counter()
+            while True:
+                transport.sendto(b"/data/%d/%d/%s/" % (id, pos, line))
+                try:
+                    await asyncio.wait_for(client.expect(b"data", pos), 1)
+                    break
+                except asyncio.TimeoutError:
+                    resends[0] += 1  # lost on the way
+            latencies.append(time.perf_counter() - start)
+            pos += len(line)
+            transport.sendto(b"/ack/%d/%d/" % (id, pos))
+        transport.sendto(b"/close/%d/" % id)
+    finally:
+        transport.close()
+
+
+async def run(port, clients, seconds):
+    latencies, resends = [], [0]
+    await asyncio.sleep(0.5)  # let the workers bind
+    start = time.perf_counter()
+    deadline = start + seconds
+    await asyncio.gather(*(session(port, id, deadline, latencies, resends)
+                           for id in range(1, clients + 1)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return (4 * len(latencies) / elapsed, latencies[len(latencies) // 2],
+            latencies[len(latencies) * 99 // 100], resends[0])
+
+
+def bench(clients, seconds):
+    print(f"{clients=} {seconds=} cpus={os.cpu_count()}")
+    for workers in (0, 1, 2, 4):
+        # a fresh port each round: exiting workers may still hold the last
+        port = 12380 + workers
+        server = multiprocessing.Process(target=serve, args=(workers, port))
+        server.start()
+        try:
+            rate, median, p99, resends = asyncio.run(
+                run(port, clients, seconds))
+        finally:
+            server.terminate()
+            server.join()
+        name = f"{workers} workers" if workers else "single"
+        print(f"{name:>10}: {rate:9,.0f} datagrams/s,"
+              f" latency p50 {median * 1000:6.2f}ms p99 {p99 * 1000:6.2f}ms,"
+              f" {resends} lines resent")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    bench(*(args + [200, 5][len(args):]))
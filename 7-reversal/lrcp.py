@@ -0,0 +1,78 @@
+from collections import namedtuple
+
+
+# kind is the raw type field; rest tells whether anything followed the
+# session id. for data, pos is None when the position is malformed and
+# data is None when the payload has an unescaped slash; for ack, pos is
+# None unless the position is a valid non-negative number.
+Message = namedtuple("Message", "kind session rest pos data")
+
+SLASH, BACKSLASH = b"/", b"\\"
+MAX_SIZE = 1000  # messages must be smaller than this
+
+
+def parse(datagram):
+    """split an LRCP datagram into a Message, or None if it is ignored
+
+       fields are found with bytes.find on the raw datagram (bytes or
+       bytearray) and nothing is decoded. as before: the message is
+       /kind/session/ followed by anything up to the last slash (what
+       comes after that is ignored), and the session must be positive.
+    """
+    if datagram[:1] != SLASH or (end := datagram.find(SLASH, 1)) <= 1:
+        return None
+    kind = datagram[1:end]
+    beg = end + 1
+    if (end := datagram.find(SLASH, beg)) < 0:
+        return None
+    if not (digits := datagram[beg:end]).isdigit():
+        return None
+    if not (session := int(digits)):
+        return None
+    if (last := datagram.rfind(SLASH)) == end:
+        return Message(kind, session, False, None, None)
+
+    rest = datagram[end + 1:last]
+    pos = data = None
+    if kind == b"data":
+        if (end := rest.find(SLASH)) > 0 and (digits := rest[:end]).isdigit():
+            pos = int(digits)
+            data = unescape(rest[end + 1:])
+    elif kind == b"ack":
+        try:
+            if (pos := int(rest)) < 0:
+                pos = None
+        except ValueError:
+            pass
+    return Message(kind, session, True, pos, data)
+
+
+def unescape(data):
+    """the payload with \\\\ and \\/ unescaped, or None if it contains a
+       slash not preceded by a backslash
+
+       a backslash pair becomes one backslash, and a backslash (single
+       or from a pair) right before a slash is dropped; other backslashes
+       are kept as they are.
+    """
+    if BACKSLASH not in data:  # the usual case: nothing to do
+        return None if SLASH in data else data
+    pos = -1
+    while (pos := data.find(SLASH, pos + 1)) >= 0:
+        if not pos or data[pos - 1] != 0x5c:
+            return None
+    out = []
+    beg = 0
+    while (pos := data.find(BACKSLASH, beg)) >= 0:
+        out.append(data[beg:pos])
+        beg = pos + 2 if data[pos + 1:pos + 2] == BACKSLASH else pos + 1
+        if data[beg:beg + 1] != SLASH:
+            out.append(BACKSLASH)
+    out.append(data[beg:])
+    return b"".join(out)
+
+
+def escape(data):
+    """the payload with backslashes and slashes escaped, for a data
+       message; adds one byte for each of them"""
+    return data.replace(BACKSLASH, b"\\\\").replace(SLASH, b"\\/")
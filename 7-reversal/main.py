@@ -1,17 +1,38 @@
 import asyncio
-import re
+import multiprocessing
+import signal
 import socket
+import sys
+from collections import deque
+from multiprocessing.connection import wait
+from os import getenv, getpid
+
+from lrcp import MAX_SIZE, escape, parse
+from timers import TimerWheel
 
 
 sessions = {}
+timers = TimerWheel()  # retransmission and expiry for every session
 SESSION_TIMEOUT = 60
 RETRANSMISSION_TIMEOUT = 3
+MAX_RETRANSMISSION_TIMEOUT = 24  # after three doublings
+WINDOW = int(getenv("WINDOW", 16384))  # bytes in flight per session
 
 
 class ReadBuffer:
+    """received bytes not yet returned as lines
+
+       length counts every byte received. lines are taken from head
+       onwards and the consumed prefix is only dropped once it is at
+       least half the buffer, so each byte is copied a bounded number of
+       times however long the session; scanned remembers where the last
+       search for a newline stopped.
+    """
 
     def __init__(self):
-        self.buffer = ""
+        self.buffer = bytearray()
+        self.head = 0  # start of the unread part of buffer
+        self.scanned = 0  # no newline in buffer[head:scanned]
         self.length = 0
 
     def add(self, pos, data):
@@ -21,93 +42,163 @@ class ReadBuffer:
         return len(append) > 0
 
     def readline(self):
-        line = None
-        if 0 <= (end := self.buffer.find("\n")):
-            line, self.buffer = self.buffer[:end], self.buffer[end + 1:]
+        buffer = self.buffer
+        if (end := buffer.find(b"\n", self.scanned)) < 0:
+            self.scanned = len(buffer)
+            return None
+        line = bytes(buffer[self.head:end])
+        self.head = self.scanned = end + 1
+        if self.head * 2 >= len(buffer):
+            del buffer[:self.head]
+            self.head = self.scanned = 0
         return line
 
 
-class WriteBuffer:
+class Segment:
+    """a data message in flight: it carries output up to offset end"""
+
+    __slots__ = ("end", "message", "due", "timeout")
+
+    def __init__(self, end, message, due):
+        self.end = end
+        self.message = message  # escaped once, sent as is every time
+        self.due = due  # loop time it is sent again unless acked
+        self.timeout = RETRANSMISSION_TIMEOUT
 
-    def __init__(self, writer, session_id):
+
+class WriteBuffer:
+    """output for the client, sent through a sliding window
+
+       offsets acked..sent are in flight as segments, each a ready-made
+       data message; buffer[head:] holds sent..length, not yet cut into
+       segments. segments are cut as the window allows (sent - acked below
+       window bytes) and an ack frees segments and moves the window on.
+       only unacknowledged segments are retransmitted: each on its own
+       timer, the timeout doubling on every resend, or all of them once
+       three duplicate acks show a segment missing (the client drops what
+       arrives after a gap). retransmit_at is the earliest a segment may
+       be due; wake(when) asks the session's timer to fire by then.
+    """
+
+    def __init__(self, writer, session_id, wake, window=WINDOW):
         self.writer = writer
         self.session_id = session_id
-        self.buffer = ""
+        self.wake = wake
+        self.window = window
+        self.buffer = bytearray()
+        self.head = 0  # index in buffer of offset sent
+        self.segments = deque()
         self.length = 0
         self.acked = 0
-        self.sending = None
+        self.sent = 0
+        self.duplicates = 0  # acks for acked since it last moved
+        self.go_back_at = 3  # duplicates
+        self.retransmit_at = None  # loop time
 
     def add(self, line):
-        self.buffer += line + "\n"
+        self.buffer += line
+        self.buffer += b"\n"
         self.length += len(line) + 1
 
     def send_all(self):
-        if self.sending:
-            self.sending.cancel()
-        self.sending = asyncio.create_task(self.send_chunked(self.buffer))
-
-    async def send_chunked(self, data):
-
-        def send_in_parts(parts):
-            sent = self.acked
-            while parts:
-                part, parts = parts[:500], parts[500:]  # max msg size 1000
-                part = part.replace("/", r"\/").replace("\\", r"\\")
-                message = f"/data/{self.session_id}/{sent}/{part}/"
-                self.writer(message)
-                sent += len(part)
-
-        while self.session_id in sessions and self.length > self.acked:
-            send_in_parts(data)
-            await asyncio.sleep(RETRANSMISSION_TIMEOUT)
+        """send what the window has room for"""
+        # a segment more for each of the first two duplicate acks, so
+        # that a gap near the end of the window is duplicated three times
+        window = self.acked + self.window + min(self.duplicates, 2) * MAX_SIZE
+        if self.sent == self.length or self.sent >= window:
+            return
+        due = asyncio.get_running_loop().time() + RETRANSMISSION_TIMEOUT
+        buffer = self.buffer
+        while self.sent < self.length and self.sent < window:
+            header = b"/data/%d/%d/" % (self.session_id, self.sent)
+            room = MAX_SIZE - 2 - len(header)  # the closing slash too
+            part = buffer[self.head:self.head + room]
+            escapes = part.count(b"/") + part.count(b"\\")
+            if len(part) + escapes > room:  # fits escaped, however many
+                part = part[:max(room - escapes, room // 2)]
+            message = header + escape(part) + b"/"
+            self.head += len(part)
+            self.sent += len(part)
+            self.segments.append(Segment(self.sent, message, due))
+            self.writer(message)
+        if self.head * 2 >= len(buffer):
+            del buffer[:self.head]
+            self.head = 0
+        if self.retransmit_at is None or due < self.retransmit_at:
+            self.retransmit_at = due  # earlier than the backed off ones
+            self.wake(due)
+
+    def retransmit(self, now):
+        """resend the segments due and work out when the next one is"""
+        earliest = None
+        for segment in self.segments:
+            if segment.due <= now:
+                self.writer(segment.message)
+                segment.timeout = min(segment.timeout * 2,
+                                      MAX_RETRANSMISSION_TIMEOUT)
+                segment.due = now + segment.timeout
+            if earliest is None or segment.due < earliest:
+                earliest = segment.due
+        self.retransmit_at = earliest
 
     def ack(self, pos):
-        if pos <= self.acked:  # duplicate or overlapping
+        segments = self.segments
+        if pos < self.acked:  # old
             pass
-        elif pos == self.length:  # ack all
-            self.acked = pos
-            self.buffer = ""
-        elif pos > self.length:  # not reasonable
-            self.writer(f"/close/{self.session_id}/")
+        elif pos == self.acked:  # duplicate: the client lacks what follows
+            if segments:
+                self.duplicates += 1
+                if self.duplicates == self.go_back_at:
+                    self.go_back()
+                elif self.duplicates < 3:
+                    self.send_all()
+        elif pos > self.sent:  # not reasonable
+            self.writer(b"/close/%d/" % self.session_id)
             del sessions[self.session_id]
-        elif pos < self.length:  # partial (between acked and length)
-            self.buffer = self.buffer[pos - self.acked:]
+        else:  # moves the window on
             self.acked = pos
+            self.duplicates = 0
+            self.go_back_at = 3
+            while segments and segments[0].end <= pos:
+                segments.popleft()
             self.send_all()
 
+    def go_back(self):
+        """resend every segment, the client having dropped those after the
+           gap; the ones still in flight bring more duplicates, so doing
+           it again takes as many more as were resent"""
+        due = asyncio.get_running_loop().time() + RETRANSMISSION_TIMEOUT
+        for segment in self.segments:
+            self.writer(segment.message)
+            segment.due = max(segment.due, due)
+        self.go_back_at += len(self.segments)
+
 
 class Session:
 
     def __init__(self, id, server, address):
         self.reader = ReadBuffer()
-        self.writer = WriteBuffer(self.send, id)
+        self.writer = WriteBuffer(self.send, id, self.wake)
         self.id = id
         self.server = server
         self.address = address
-        self.expiry = None
+        self.expires = None  # loop time
 
     def send(self, message):
-        print(f"sending: {message}")
-        self.server.sendto(message.encode(), self.address)
-
-    def handle(self, message):
-        if match := re.match(r"(\d+?)/(.*)", message,
-                             flags=re.MULTILINE | re.DOTALL):
-            pos, message = match.groups()
-            pos = int(pos)
-            if pos < 0:
-                return
+        self.server.sendto(message, self.address)
+
+    def handle(self, pos, data):
+        if pos is not None:
             if pos > self.reader.length:
-                self.send(f"/ack/{self.id}/{self.reader.length}/")
+                self.send(b"/ack/%d/%d/" % (self.id, self.reader.length))
                 return
 
-            if re.search(r"(?<!\\)/", message):
+            if data is None:
                 print(f"message for {self.id} has too many parts")
                 return
-            message = message.replace(r"\\", "\\").replace(r"\/", "/")
 
-            if self.reader.add(pos, message):
-                self.send(f"/ack/{self.id}/{self.reader.length}/")
+            if self.reader.add(pos, data):
+                self.send(b"/ack/%d/%d/" % (self.id, self.reader.length))
                 original_length = self.writer.length
                 while line := self.reader.readline():
                     self.writer.add(line[::-1])
@@ -115,74 +206,106 @@ class Session:
                     self.writer.send_all()
 
     def ack(self, pos):
-        try:
-            pos = int(pos)
-            if pos < 0:
-                return
-        except ValueError:
-            return
-        self.writer.ack(pos)
+        if pos is not None:
+            self.writer.ack(pos)
 
-    async def inactivity_timer(self):
-        await asyncio.sleep(SESSION_TIMEOUT)
-        print(f"session {self.id} expired")
-        del sessions[self.id]
+    def wake(self, when):
+        timers.schedule(self, when)
 
     def reset_expiry(self):
-        if self.expiry:
-            self.expiry.cancel()
-        self.expiry = asyncio.create_task(self.inactivity_timer())
-
-
-async def main(host, port):
+        self.expires = asyncio.get_running_loop().time() + SESSION_TIMEOUT
+        timers.schedule(self, self.expires)  # no-op unless nothing is due
+
+    def on_timer(self, now):
+        """expire or retransmit as due; returns the next deadline"""
+        if sessions.get(self.id) is not self:
+            return None  # closed meanwhile
+        if now >= self.expires:
+            print(f"session {self.id} expired")
+            del sessions[self.id]
+            return None
+        writer = self.writer
+        if writer.retransmit_at is not None and now >= writer.retransmit_at:
+            writer.retransmit(now)
+        if writer.retransmit_at is None:
+            return self.expires
+        return min(self.expires, writer.retransmit_at)
+
+
+async def main(host, port, reuseport=False):
     server = socket.socket(
         family=socket.AF_INET, type=socket.SOCK_DGRAM)
+    if reuseport:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     server.setblocking(False)
     server.bind((host, port))
-    print(f"listening on {port}")
+    if reuseport:
+        print(f"worker {getpid()} listening on {port}")
+    else:
+        print(f"listening on {port}")
 
     loop = asyncio.get_running_loop()
     while True:
-        message, address = await loop.sock_recvfrom(server, 1000)
-        message = message.decode()
-        print(address, message)
-
-        if match := re.match(
-                r"/([^/]+?)/(\d+?)/(?:(.*)/)?", message,
-                flags=re.MULTILINE | re.DOTALL):
-            type, session_id, remainder = match.groups()
-            session_id = int(session_id)
-            print(type, session_id, remainder)
-            if session_id > 0:
-
-                if type == "connect" and remainder is None:
-                    if not (session := sessions.get(session_id)):
-                        session = Session(session_id, server, address)
-                        sessions[session_id] = session
-                    session.send(f"/ack/{session_id}/0/")
-                    session.reset_expiry()
-
-                elif type == "close" and remainder is None:
-                    print(f"closing session {session_id}")
-                    server.sendto(
-                        f"/close/{session_id}/".encode(), address)
-                    if session_id in sessions:
-                        del sessions[session_id]
-
-                else:
-                    if not (session := sessions.get(session_id)):
-                        server.sendto(
-                            f"/close{session_id}/".encode(), address)
-
-                    elif type == "data" and remainder is not None:
-                        session.handle(remainder)
-                        session.reset_expiry()
-
-                    elif type == "ack" and remainder is not None:
-                        session.ack(remainder)
-                        session.reset_expiry()
+        message, address = await loop.sock_recvfrom(server, MAX_SIZE)
+        if not (message := parse(message)):
+            continue
+        type, session_id, rest, pos, data = message
+
+        if type == b"connect" and not rest:
+            if not (session := sessions.get(session_id)):
+                session = Session(session_id, server, address)
+                sessions[session_id] = session
+            session.send(b"/ack/%d/0/" % session_id)
+            session.reset_expiry()
+
+        elif type == b"close" and not rest:
+            print(f"closing session {session_id}")
+            server.sendto(f"/close/{session_id}/".encode(), address)
+            if session := sessions.pop(session_id, None):
+                timers.cancel(session)
+
+        elif not (session := sessions.get(session_id)):
+            server.sendto(f"/close{session_id}/".encode(), address)
+
+        elif type == b"data" and rest:
+            session.handle(pos, data)
+            session.reset_expiry()
+
+        elif type == b"ack" and rest:
+            session.ack(pos)
+            session.reset_expiry()
+
+
+def worker(host, port):
+    asyncio.run(main(host, port, reuseport=True))
+
+
+def run(host, port, workers):
+    """serve from workers processes, each with its own SO_REUSEPORT
+       socket and its own sessions
+
+       the kernel picks the socket for a datagram by hashing its source
+       and destination addresses, so each client keeps to the worker
+       that has its sessions. if a worker exits the others are stopped
+       too: its clients would be hashed onto workers that don't know
+       their sessions.
+    """
+    processes = [multiprocessing.Process(target=worker, args=(host, port),
+                                         daemon=True)
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit())  # stop them too
+    try:
+        wait([process.sentinel for process in processes])
+    finally:
+        for process in processes:
+            process.terminate()
 
 
 if __name__ == "__main__":
-    from os import getenv
-    asyncio.run(main(getenv("HOST", "0.0.0.0"), int(getenv("PORT", 12345))))
+    host, port = getenv("HOST", "0.0.0.0"), int(getenv("PORT", 12345))
+    if (workers := int(getenv("WORKERS", 1))) > 1:
+        run(host, port, workers)
+    else:
+        asyncio.run(main(host, port))
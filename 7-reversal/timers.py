@@ -0,0 +1,67 @@
+import asyncio
+from math import ceil
+
+
+class TimerWheel:
+    """deadlines for many objects on one hashed timer wheel
+
+       an item is filed under the slot of the tick it is due; one task
+       wakes each tick and calls item.on_timer(now) for the items due,
+       which returns the item's next deadline (loop time) or None.
+
+       items keep their own deadlines, so pushing one later (an idle
+       timeout on every packet) needs nothing from the wheel: the item
+       is simply asked again when its earlier filing comes due. schedule
+       only refiles an item when the new deadline is sooner. both are
+       O(1). the task only runs while items are filed.
+    """
+
+    def __init__(self, tick=0.1, size=1024):
+        self.tick = tick
+        self.slots = [{} for _ in range(size)]  # item -> due tick
+        self.due = {}  # item -> due tick
+        self.now = 0  # ticks since start
+        self.start = None  # loop time of tick 0
+        self.task = None
+
+    def __len__(self):
+        return len(self.due)
+
+    def schedule(self, item, when):
+        """have item.on_timer called at loop time when, or sooner"""
+        if self.start is None:
+            self.start = asyncio.get_running_loop().time()
+        tick = max(self.now + 1, ceil((when - self.start) / self.tick))
+        if (filed := self.due.get(item)) is not None:
+            if filed <= tick:
+                return
+            del self.slots[filed % len(self.slots)][item]
+        self.slots[tick % len(self.slots)][item] = tick
+        self.due[item] = tick
+        if not self.task:
+            self.task = asyncio.create_task(self.run())
+
+    def cancel(self, item):
+        if (filed := self.due.pop(item, None)) is not None:
+            del self.slots[filed % len(self.slots)][item]
+
+    def advance(self, now):
+        self.now += 1
+        slot = self.slots[self.now % len(self.slots)]
+        fired = [item for item, tick in slot.items() if tick <= self.now]
+        for item in fired:
+            del slot[item], self.due[item]
+        for item in fired:
+            if (when := item.on_timer(now)) is not None:
+                self.schedule(item, when)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self.due:
+                await asyncio.sleep(
+                    self.start + (self.now + 1) * self.tick - loop.time())
+                while self.start + (self.now + 1) * self.tick <= loop.time():
+                    self.advance(loop.time())  # catch up if we slept late
+        finally:
+            self.task = None
@@ -0,0 +1,113 @@
+"""requests/second: reading a byte at a time vs the buffered cipher stream
+
+   the server runs in a child process (output discarded) with the old
+   Reader, which awaited readexactly(1) and deciphered each byte, or the
+   buffered one. clients send a cipher spec with position dependent
+   operations, then pipeline their requests (long toy lists) in batches
+   and read the answers, checking each one.
+
+   usage: python bench_stream.py [clients] [requests] [toys]
+"""
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import main
+from cipher import ADDPOS, REVERSEBITS, SUBPOS, XOR, Cipher
+
+SPEC = bytes([2, 123, 5, 1, 0])  # xor 123, addpos, reversebits
+BATCH = 50  # requests written together
+
+
+class LegacyReader:
+
+    def __init__(self, reader, cipher):
+        self.reader = reader
+        self.cipher = cipher
+        self.read_length = 0
+
+    async def readline(self):
+        line = ""
+        while True:
+            byte = await self.reader.readexactly(1)
+            char = self.cipher.apply(byte, self.read_length)[0]
+            self.read_length += 1
+            if char == 10:
+                break
+            line += chr(char)
+
+        return line
+
+
+def serve(legacy, port):
+    sys.stdout = sys.stderr = open(os.devnull, "w")
+    if legacy:
+        main.Reader = LegacyReader
+    asyncio.run(main.main(port))
+
+
+def requests(count, toys, seed):
+    """(request line, expected answer) pairs"""
+    rand = random.Random(seed)
+    out = []
+    for _ in range(count):
+        counts = rand.sample(range(1, 100_000), toys)
+        parts = [f"{n}x toy number {n % 997}" for n in counts]
+        out.append(((",".join(parts) + "\n").encode(),
+                    (parts[counts.index(max(counts))] + "\n").encode()))
+    return out
+
+
+async def client(port, work):
+    for _ in range(50):
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            break
+        except OSError:
+            await asyncio.sleep(0.1)
+    encrypt = Cipher([XOR[123], ADDPOS, REVERSEBITS])
+    decrypt = Cipher([REVERSEBITS, SUBPOS, XOR[123]])
+    writer.write(SPEC)
+    sent = received = 0
+    for beg in range(0, len(work), BATCH):
+        batch = work[beg:beg + BATCH]
+        data = b"".join(line for line, _ in batch)
+        writer.write(encrypt.apply(data, sent))
+        sent += len(data)
+        size = sum(len(answer) for _, answer in batch)
+        data = await reader.readexactly(size)
+        assert decrypt.apply(data, received) == b"".join(
+            answer for _, answer in batch)
+        received += size
+    writer.close()
+
+
+async def run(port, clients, work):
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, work[i]) for i in range(clients)))
+    return sum(map(len, work)) / (time.perf_counter() - start)
+
+
+def bench(clients, count, toys):
+    print(f"{clients=} requests={count} {toys=}")
+    work = [requests(count, toys, seed) for seed in range(clients)]
+    size = sum(len(line) for line, _ in work[0]) / count
+    print(f"requests of {size:,.0f} bytes")
+    for name, legacy in (("readexactly(1)", True), ("buffered", False)):
+        port = 12370 + legacy  # a fresh port each round
+        server = multiprocessing.Process(target=serve, args=(legacy, port))
+        server.start()
+        try:
+            rate = asyncio.run(run(port, clients, work))
+        finally:
+            server.terminate()
+            server.join()
+        print(f"{name:>14}: {rate:9,.0f} requests/s")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    bench(*(args + [20, 200, 100][len(args):]))
@@ -0,0 +1,61 @@
+"""the cipher spec operations, compiled into bytes.translate tables
+
+   an operation is either a 256 byte table, when it does the same to a
+   byte wherever it is in the stream, or a list of 256 such tables, one
+   for each stream position mod 256 (all the position dependent
+   operations only see the position mod 256).
+"""
+from operator import or_
+
+IDENTITY = bytes(range(256))
+REVERSEBITS = bytes(int(f"{byte:08b}"[::-1], 2) for byte in range(256))
+XOR = [bytes(byte ^ val for byte in range(256)) for val in range(256)]
+ADD = [bytes((byte + val) & 255 for byte in range(256)) for val in range(256)]
+SUB = ADD[:1] + ADD[:0:-1]  # SUB[val] adds -val
+XORPOS, ADDPOS, SUBPOS = XOR, ADD, SUB
+
+SHORT = 1024  # bytes, above which translating strided slices is faster
+OFFSETS = [pos << 8 for pos in range(256)] * 5  # from any pos, SHORT long
+
+
+def compose(operations, pos):
+    """one table doing operations in turn at positions pos mod 256"""
+    table = IDENTITY
+    for operation in operations:
+        table = table.translate(
+            operation if isinstance(operation, bytes) else operation[pos])
+    return table
+
+
+class Cipher:
+    """operations compiled once: a single table if none of them depends
+       on the position, else a table per position mod 256, the one for
+       pos at tables[pos << 8:pos + 1 << 8]"""
+
+    def __init__(self, operations):
+        if all(isinstance(operation, bytes) for operation in operations):
+            self.table = compose(operations, 0)
+            self.tables = None
+        else:
+            self.table = None
+            self.tables = b"".join(compose(operations, pos)
+                                   for pos in range(256))
+
+    def apply(self, data, pos):
+        """data, starting at stream position pos, through the operations
+
+           with a table per position, short data is looked up byte by
+           byte at tables[pos << 8 | byte] (all in C, through map); longer
+           data a strided slice at a time, for the bytes sharing a
+           position mod 256."""
+        if self.tables is None:
+            return data.translate(self.table)
+        tables, pos = self.tables, pos & 255
+        if len(data) <= SHORT:
+            return bytes(map(tables.__getitem__,
+                             map(or_, OFFSETS[pos:pos + len(data)], data)))
+        out = bytearray(len(data))
+        for i in range(256):
+            at = (pos + i) & 255
+            out[i::256] = data[i::256].translate(tables[at << 8:at + 1 << 8])
+        return out
@@ -1,65 +1,43 @@
 import asyncio
 
-
-def reversebits(byte, _):
-    # faster than individual bit manipulation
-    return int(bin(byte)[2:].rjust(8, "0")[::-1], 2)
-
-
-def xor(val):
-    val = val & 255
-    def inner(byte, _):
-        return byte ^ val
-    return inner
-
-
-def xorpos(byte, pos):
-    return (byte ^ pos) & 255
-
-
-def add(val):
-    def inner(byte, _):
-        return (byte + val) & 255
-    return inner
-
-
-def addpos(byte, pos):
-    return (byte + pos) & 255
-
-
-def sub(val):
-    def inner(byte, _):
-        return (byte - val) & 255
-    return inner
-
-
-def subpos(byte, pos):
-    return (byte - pos) & 255
-
-
-def crypt(byte, cipher, pos):
-    for fn in cipher:
-        byte = fn(byte, pos)
-    return byte
+from cipher import (ADD, ADDPOS, REVERSEBITS, SUB, SUBPOS, XOR, XORPOS,
+                    Cipher)
 
 
 class Reader:
+    """lines from the deciphered stream
 
-    def __init__(self, reader, cipher):
+       whatever has arrived is read and deciphered in one go (so
+       read_length, the stream position, moves a chunk at a time) into
+       buffer; lines are split off it with find. the consumed prefix,
+       buffer[:head], is only dropped once it is at least half the
+       buffer, and scanned remembers where the search for a newline
+       stopped.
+    """
+
+    def __init__(self, reader, cipher, chunk=65536):
         self.reader = reader
         self.cipher = cipher
+        self.chunk = chunk
         self.read_length = 0
+        self.buffer = bytearray()
+        self.head = 0
+        self.scanned = 0  # no newline in buffer[head:scanned]
 
     async def readline(self):
-        line = ""
-        while True:
-            byte = (await self.reader.readexactly(1))[0]
-            char = crypt(byte, self.cipher, self.read_length)
-            self.read_length += 1
-            if char == 10:
-                break
-            line += chr(char)
-
+        buffer = self.buffer
+        while (end := buffer.find(b"\n", self.scanned)) < 0:
+            self.scanned = len(buffer)
+            if not (data := await self.reader.read(self.chunk)):
+                raise asyncio.IncompleteReadError(bytes(buffer[self.head:]),
+                                                  None)
+            buffer += self.cipher.apply(data, self.read_length)
+            self.read_length += len(data)
+        line = buffer[self.head:end].decode("latin-1")  # a char per byte
+        self.head = self.scanned = end + 1
+        if self.head * 2 >= len(buffer):
+            del buffer[:self.head]
+            self.head = self.scanned = 0
         return line
 
 
@@ -71,12 +49,12 @@ class Writer:
         self.write_length = 0
 
     def writeline(self, line):
-        line += "\n"
-        data = []
-        for c in line:
-            data.append(crypt(ord(c), self.cipher, self.write_length))
-            self.write_length += 1
-        self.writer.write(bytes(data))
+        data = line.encode("latin-1") + b"\n"  # chars are bytes, as in Reader
+        self.writer.write(self.cipher.apply(data, self.write_length))
+        self.write_length += len(data)
+
+    async def drain(self):
+        await self.writer.drain()
 
     def close(self):
         self.writer.close()
@@ -84,13 +62,11 @@ class Writer:
 
 def test_cipher(cipher, decipher):
     test = bytes(i for i in range(256))
-    enc = bytes([crypt(b, cipher, p)
-                 for p, b in enumerate([c for c in test])])
+    enc = cipher.apply(test, 0)
     if enc == test:
         raise Exception("NOP cipher specified")
 
-    dec = bytes([crypt(b, decipher, p)
-                 for p, b in enumerate([c for c in enc])])
+    dec = decipher.apply(enc, 0)
     if dec != test:
         raise Exception("cipher/decipher don't match")  # self-check
 
@@ -110,27 +86,28 @@ async def on_connect(reader, writer):
                 break
 
             elif spec == 0x01:
-                cipher.append(reversebits)
-                decipher.insert(0, reversebits)
+                cipher.append(REVERSEBITS)
+                decipher.insert(0, REVERSEBITS)
 
             elif spec == 0x02:
                 xor_with = (await reader.readexactly(1))[0]
-                cipher.append(xor(xor_with))
-                decipher.insert(0, xor(xor_with))
+                cipher.append(XOR[xor_with])
+                decipher.insert(0, XOR[xor_with])
 
             elif spec == 0x03:
-                cipher.append(xorpos)
-                decipher.insert(0, xorpos)
+                cipher.append(XORPOS)
+                decipher.insert(0, XORPOS)
 
             elif spec == 0x04:
                 add_with = (await reader.readexactly(1))[0]
-                cipher.append(add(add_with))
-                decipher.insert(0, sub(add_with))
+                cipher.append(ADD[add_with])
+                decipher.insert(0, SUB[add_with])
 
             elif spec == 0x05:
-                cipher.append(addpos)
-                decipher.insert(0, subpos)
+                cipher.append(ADDPOS)
+                decipher.insert(0, SUBPOS)
 
+        cipher, decipher = Cipher(cipher), Cipher(decipher)  # compiled
         test_cipher(cipher, decipher)
 
         reader = Reader(reader, decipher)
@@ -143,6 +120,7 @@ async def on_connect(reader, writer):
             largest = parts[-1][-1]
             print(f"{host}:{port} {largest}")
             writer.writeline(largest)
+            await writer.drain()  # a pipelining client must read too
 
     except asyncio.IncompleteReadError:
         pass
@@ -151,8 +129,8 @@ async def on_connect(reader, writer):
         writer.close()
 
 
-async def main():
-    server = await asyncio.start_server(on_connect, port=12345)
+async def main(port=12345):
+    server = await asyncio.start_server(on_connect, port=port)
     print(f"listening on port {server.sockets[0].getsockname()[1]}")
     await server.serve_forever()
 